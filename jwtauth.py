@@ -0,0 +1,419 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.request import urlopen
+
+from flask import request
+from jose import jwk, jws, jwt
+
+"""
+jwtauth
+    Auth0 bearer-token checks shared by BasicFlaskAuth and the coffee shop
+
+    An app makes one Auth for its tenant and decorates its routes with that
+    object's requires_auth:
+
+        auth = Auth("example.auth0.com", "drinks")
+
+        @app.route("/drinks-detail")
+        @auth.requires_auth("get:drinks-detail")
+        def drinks_detail(payload):
+            ...
+
+    It is installed with pool.py from the repository root's setup.py, which
+    each project's requirements.txt pulls in.
+"""
+
+TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 1024))
+STAGES = ("header", "key", "signature", "claims")
+
+
+## AuthError Exception
+"""
+AuthError Exception
+A standardized way to communicate auth failure modes
+"""
+
+
+class AuthError(Exception):
+    def __init__(self, error, status_code):
+        self.error = error
+        self.status_code = status_code
+
+
+## JWKS Cache
+"""
+JWKSCache
+    the signing keys of a JWKS endpoint, indexed by kid
+
+    Keys are fetched on first use and then refreshed by a background thread
+    shortly before ttl runs out. Each key is constructed once when it is
+    fetched, so a lookup is a dict access that returns a key object ready to
+    verify with. A token signed with a kid that is not in the cache (the
+    keys were rotated) forces a refetch, at most once per refetch_interval
+    seconds so a flood of bad tokens cannot hammer the endpoint; the same
+    limit applies while the first fetch keeps failing. fetch(url)
+    returns the parsed JWKS document; tests pass one that serves local keys.
+"""
+
+
+def fetch_jwks(url, timeout=5):
+    with urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class JWKSCache:
+    def __init__(self, url, fetch=fetch_jwks, ttl=3600, refetch_interval=60,
+                 background=True, algorithm="RS256"):
+        self.url = url
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refetch_interval = refetch_interval
+        self.background = background
+        self.algorithm = algorithm
+        self.keys = {}
+        self.expires = 0
+        self.last_fetch = None
+        self.last_attempt = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def refresh(self):
+        with self.lock:
+            self.last_attempt = time.monotonic()
+            keys = self.fetch(self.url)["keys"]
+            self.keys = {
+                key["kid"]: jwk.construct(key, key.get("alg", self.algorithm))
+                for key in keys
+                if "kid" in key and key.get("use", "sig") == "sig"
+            }
+            self.last_fetch = time.monotonic()
+            self.expires = self.last_fetch + self.ttl
+
+    def get(self, kid):
+        """The key for kid, or None if the endpoint does not have one."""
+        now = time.monotonic()
+        if self.last_fetch is None:
+            # tokens are refused with a 401 until a fetch succeeds
+            if (self.last_attempt
+                    and now - self.last_attempt < self.refetch_interval):
+                return None
+            try:
+                self.refresh()
+            except Exception:
+                return None
+            self.start()
+        elif now >= self.expires:
+            # the background refresh is off or failing
+            try:
+                self.refresh()
+            except Exception:
+                # serve the keys we have, and wait before trying again
+                self.expires = now + self.refetch_interval
+        key = self.keys.get(kid)
+        if key is None and now - self.last_attempt >= self.refetch_interval:
+            try:
+                self.refresh()
+            except Exception:
+                return None
+            key = self.keys.get(kid)
+        return key
+
+    def start(self):
+        # two first requests may both get here
+        with self.lock:
+            if not self.background or self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self.run, name="jwks-refresh", daemon=True
+            )
+            self.thread.start()
+
+    def run(self):
+        while True:
+            # refresh a tenth of the ttl early; after a failed fetch keep
+            # the old keys and try again in refetch_interval
+            time.sleep(max(self.expires - time.monotonic() - self.ttl / 10,
+                           self.refetch_interval / 10))
+            try:
+                self.refresh()
+            except Exception:
+                time.sleep(self.refetch_interval)
+
+
+## Verified Token Cache
+"""
+TokenCache
+    payloads of tokens whose signature and claims have been verified
+
+    A frontend session sends the same bearer token many times a minute; a
+    hit skips the RS256 verification. Entries are keyed by a SHA-256 of the
+    token, dropped at the token's exp and evicted least recently used
+    beyond maxsize (0 turns the cache off). Each entry also holds the
+    token's permissions as a set for check_permissions.
+"""
+
+
+class TokenCache:
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        """(payload, permissions) for a cached token, else None."""
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            payload, permissions, exp = entry
+            if exp <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return payload, permissions
+
+    def add(self, token, payload):
+        permissions = (
+            frozenset(payload["permissions"])
+            if isinstance(payload.get("permissions"), list)
+            else None
+        )
+        exp = payload.get("exp")
+        if self.maxsize > 0 and isinstance(exp, (int, float)):
+            with self.lock:
+                self.entries[self.key(token)] = (payload, permissions, exp)
+                self.entries.move_to_end(self.key(token))
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return payload, permissions
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+## Stage Timings
+"""
+StageTimings
+    how many times each stage of a token check ran and the time spent in it
+
+    header: reading the bearer token from the Authorization header
+    key: parsing the token's header and looking up its signing key
+    signature: verifying the signature
+    claims: checking exp, audience and issuer
+
+    A token served from the TokenCache only goes through the header stage.
+"""
+
+
+class StageTimings:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.counts[stage] += 1
+            self.seconds[stage] += seconds
+
+    def reset(self):
+        with self.lock:
+            self.counts = dict.fromkeys(STAGES, 0)
+            self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    def snapshot(self):
+        """{stage: {"count", "seconds", "mean_us"}}"""
+        with self.lock:
+            return {
+                stage: {
+                    "count": self.counts[stage],
+                    "seconds": self.seconds[stage],
+                    "mean_us": (self.seconds[stage] / self.counts[stage] * 10 ** 6
+                                if self.counts[stage] else 0.0),
+                }
+                for stage in STAGES
+            }
+
+
+## Auth
+"""
+Auth
+    token checks for one Auth0 API
+
+    audience and issuer are checked against each token's aud and iss; the
+    issuer defaults to the tenant's https://<domain>/. The keys come from
+    jwks_url, or from AUTH0_JWKS_URL, or from the tenant's
+    /.well-known/jwks.json.
+"""
+
+
+def get_token_auth_header():
+    """Obtains the Access Token from the Authorization Header
+    """
+    auth = request.headers.get("Authorization", None)
+    if not auth:
+        raise AuthError({
+            "code": "authorization_header_missing",
+            "description": "Authorization header is expected.",
+        }, 401)
+
+    parts = auth.split()
+    if parts[0].lower() != "bearer":
+        raise AuthError({
+            "code": "invalid_header",
+            "description": 'Authorization header must start with "Bearer".',
+        }, 401)
+    elif len(parts) == 1:
+        raise AuthError({
+            "code": "invalid_header",
+            "description": "Token not found.",
+        }, 401)
+    elif len(parts) > 2:
+        raise AuthError({
+            "code": "invalid_header",
+            "description": "Authorization header must be bearer token.",
+        }, 401)
+    return parts[1]
+
+
+def check_permissions(permission, payload, permissions=None):
+    if "permissions" not in payload:
+        raise AuthError(
+            {
+                "code": "invalid_claims",
+                "description": "Permissions not included in JWT.",
+            },
+            400,
+        )
+
+    if permissions is None:
+        permissions = payload["permissions"]
+    if permission not in permissions:
+        raise AuthError(
+            {"code": "unauthorized", "description": "Permission not found."}, 403
+        )
+    return True
+
+
+class Auth:
+    def __init__(self, domain, audience, issuer=None, algorithms=("RS256",),
+                 jwks_url=None, jwks=None, token_cache_size=TOKEN_CACHE_SIZE):
+        self.domain = domain
+        self.audience = audience
+        self.issuer = issuer or "https://" + domain + "/"
+        self.algorithms = list(algorithms)
+        if jwks is None:
+            jwks = JWKSCache(
+                jwks_url
+                or os.environ.get("AUTH0_JWKS_URL")
+                or "https://" + domain + "/.well-known/jwks.json",
+                algorithm=self.algorithms[0],
+            )
+        self.jwks = jwks
+        self.verified_tokens = TokenCache(token_cache_size)
+        self.timings = StageTimings()
+
+    def verify_decode_jwt(self, token):
+        timings = self.timings
+        start = time.perf_counter()
+        try:
+            unverified_header = jwt.get_unverified_header(token)
+        except Exception:
+            raise AuthError(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to parse authentication token.",
+                },
+                401,
+            )
+        key = self.jwks.get(unverified_header.get("kid"))
+        signed = time.perf_counter()
+        timings.add("key", signed - start)
+        if key is None:
+            raise AuthError(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to find appropriate key",
+                },
+                401,
+            )
+
+        try:
+            jws.verify(token, key, self.algorithms)
+        except Exception:
+            raise AuthError(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to parse authentication token.",
+                },
+                401,
+            )
+        verified = time.perf_counter()
+        timings.add("signature", verified - signed)
+
+        try:
+            # the signature is good, so only the claims are left to check
+            payload = jwt.decode(
+                token,
+                key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                options={"verify_signature": False},
+            )
+        except jwt.ExpiredSignatureError:
+            raise AuthError(
+                {"code": "token_expired", "description": "token is expired"}, 401
+            )
+        except jwt.JWTClaimsError:
+            raise AuthError(
+                {
+                    "code": "invalid_claims",
+                    "description": "incorrect claims,"
+                    "please check the audience and issuer",
+                },
+                401,
+            )
+        except Exception:
+            raise AuthError(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to parse authentication token.",
+                },
+                401,
+            )
+        finally:
+            timings.add("claims", time.perf_counter() - verified)
+        return payload
+
+    def requires_auth(self, permission=""):
+        def requires_auth_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    token = get_token_auth_header()
+                finally:
+                    self.timings.add("header", time.perf_counter() - start)
+                verified = self.verified_tokens.get(token)
+                if verified is None:
+                    verified = self.verified_tokens.add(
+                        token, self.verify_decode_jwt(token))
+                payload, permissions = verified
+                if permission:
+                    check_permissions(permission, payload, permissions)
+                return f(payload, *args, **kwargs)
+
+            return wrapper
+
+        return requires_auth_decorator
@@ -0,0 +1,90 @@
+"""
+Database engine configuration.
+
+Shared by the Fyyur, trivia and coffee shop backends, which install it
+from the repository root's setup.py through their requirements.txt, so
+every deployment sizes its pool to its worker count the same way:
+
+    DB_POOL_SIZE            connections kept open per process (5)
+    DB_MAX_OVERFLOW         extra connections allowed under load (10)
+    DB_POOL_TIMEOUT         seconds to wait for a free connection (30)
+    DB_POOL_RECYCLE         seconds before a connection is replaced (1800)
+    DB_POOL_PRE_PING        test connections on checkout (true)
+    DB_STATEMENT_TIMEOUT    Postgres statement_timeout in ms, 0 for none (0)
+    DB_PGBOUNCER            pool in PgBouncer instead of here (false)
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that also records how long callers wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.metrics_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self.metrics_lock:
+                self.checkouts += 1
+                self.wait_time += waited
+
+
+def env_flag(environ, name, default):
+    return environ.get(name, default).lower() in ("1", "true", "yes", "on")
+
+
+def engine_options(database_uri, environ=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for database_uri."""
+    if database_uri.startswith("sqlite"):
+        # Flask-SQLAlchemy picks the right pool for SQLite files and memory
+        return {}
+    if env_flag(environ, "DB_PGBOUNCER", "false"):
+        # PgBouncer (transaction pooling) owns the connections: keep none
+        # open here, and leave session settings such as statement_timeout
+        # to PgBouncer since they would leak between its clients. psycopg2
+        # never uses server-side prepared statements, so nothing else
+        # needs turning off.
+        return {"poolclass": NullPool}
+    options = {
+        "poolclass": MeteredQueuePool,
+        "pool_size": int(environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": env_flag(environ, "DB_POOL_PRE_PING", "true"),
+    }
+    statement_timeout = int(environ.get("DB_STATEMENT_TIMEOUT", 0))
+    if statement_timeout:
+        options["connect_args"] = {
+            "options": "-c statement_timeout={}".format(statement_timeout)
+        }
+    return options
+
+
+def pool_metrics(engine):
+    """Current state of engine's connection pool."""
+    pool = engine.pool
+    metrics = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metrics.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, MeteredQueuePool):
+        with pool.metrics_lock:
+            metrics.update(checkouts=pool.checkouts, wait_time=pool.wait_time)
+    return metrics
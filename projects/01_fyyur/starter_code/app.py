@@ -2,91 +2,121 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, flash, redirect, url_for
+from flask import (
+    Blueprint,
+    Flask,
+    render_template,
+    request,
+    flash,
+    redirect,
+    url_for,
+)
+from flask_migrate import Migrate
 from flask_moment import Moment
 import logging
 from logging import Formatter, FileHandler
 
-from flask_sqlalchemy import SQLAlchemy
+from cache import page_cache
+from filters import format_datetime
 from forms import *
-from models import Venue, Artist, Show
+from models import db, Venue, Artist, Show
+from pagination import PAGE_SIZE, keyset_page
+from search import search
 from sqlalchemy.exc import SQLAlchemyError
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object("config")
-db = SQLAlchemy(app)
+moment = Moment()
+migrate = Migrate()
+bp = Blueprint("main", __name__)
+
+
+def create_app(config="config"):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    moment.init_app(app)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    page_cache.init_app(app)
+    app.jinja_env.filters["datetime"] = format_datetime
+    app.register_blueprint(bp)
+
+    if not app.debug:
+        file_handler = FileHandler("error.log")
+        file_handler.setFormatter(
+            Formatter(
+                "%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]")
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info("errors")
+    return app
 
 
 # ----------------------------------------------------------------------------#
-# Filters.
+# Controllers.
 # ----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(str(value))
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+def page_args():
+    """Keyset pagination cursors and page size from the query string."""
+    return {
+        "after": request.args.get("after", type=int),
+        "before": request.args.get("before", type=int),
+        "limit": request.args.get("limit", PAGE_SIZE, type=int),
+    }
 
 
-app.jinja_env.filters["datetime"] = format_datetime
+def past_and_upcoming(shows, format_show):
+    """Split shows into past and upcoming lists, keeping their order."""
+    current_time = datetime.now()
+    past_shows, upcoming_shows = [], []
+    for show in shows:
+        if show.start_time > current_time:
+            upcoming_shows.append(format_show(show))
+        else:
+            past_shows.append(format_show(show))
+    return past_shows, upcoming_shows
 
-# ----------------------------------------------------------------------------#
-# Controllers.
-# ----------------------------------------------------------------------------#
-@app.route("/")
+
+@bp.route("/")
 def index():
     return render_template("pages/home.html")
 
 
 #  Venues
 #  ----------------------------------------------------------------
-@app.route("/venues")
+@bp.route("/venues")
+@page_cache.cached("venues")
 def venues():
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    venue_query = Venue.query.all()
+    page = keyset_page(
+        Venue.areas(current_time),
+        Venue,
+        Venue.areas_order,
+        **page_args()
+    )
     data = {}
-    for venue in venue_query:
-        upcoming_shows = venue.shows.filter(
-            Show.start_time > current_time).all()
-        city_and_state = venue.city + venue.state
-        if city_and_state in data:
-            data[city_and_state].get("venues").append(
-                {
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": len(upcoming_shows),
-                }
-            )
-        else:
-            data[city_and_state] = {
-                "city": venue.city,
-                "state": venue.state,
-                "venues": [
-                    {
-                        "id": venue.id,
-                        "name": venue.name,
-                        "num_upcoming_shows": len(upcoming_shows),
-                    }
-                ],
+    for city, state, venue_id, name, num_upcoming_shows in page.items:
+        city_and_state = city + state
+        if city_and_state not in data:
+            data[city_and_state] = {"city": city, "state": state, "venues": []}
+        data[city_and_state]["venues"].append(
+            {
+                "id": venue_id,
+                "name": name,
+                "num_upcoming_shows": num_upcoming_shows,
             }
-    return render_template("pages/venues.html", areas=data.values())
+        )
+    return render_template("pages/venues.html", areas=data.values(), page=page)
 
 
-@app.route("/venues/search", methods=["POST"])
+@bp.route("/venues/search", methods=["POST"])
 def search_venues():
-    venue_query = Venue.query.filter(
-        Venue.name.ilike(f"%{request.form.get('search_term')}%")
-    )
+    venue_query = search(Venue, request.form.get("search_term"))
     venue_list = list(map(Venue.short, venue_query))
     response = {"count": len(venue_list), "data": venue_list}
     return render_template(
@@ -96,43 +126,38 @@ def search_venues():
     )
 
 
-@app.route("/venues/<int:venue_id>")
+@bp.route("/venues/<int:venue_id>")
+@page_cache.cached("venue")
 def show_venue(venue_id):
     venue = Venue.query.get(venue_id)
     if venue:
         venue_details = venue.details()
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        new_shows_query = (
-            Show.query.options(db.joinedload(Show.Venue))
+        shows_query = (
+            Show.query.options(db.joinedload(Show.Artist))
             .filter(Show.venue_id == venue_id)
-            .filter(Show.start_time > current_time)
+            .order_by(Show.start_time, Show.id)
             .all()
         )
-        new_shows_list = list(map(Show.artist_details, new_shows_query))
+        past_shows_list, new_shows_list = past_and_upcoming(
+            shows_query, Show.artist_details
+        )
         venue_details["upcoming_shows"] = new_shows_list
         venue_details["upcoming_shows_count"] = len(new_shows_list)
-        past_shows_query = (
-            Show.query.options(db.joinedload(Show.Venue))
-            .filter(Show.venue_id == venue_id)
-            .filter(Show.start_time <= current_time)
-            .all()
-        )
-        past_shows_list = list(map(Show.artist_details, past_shows_query))
         venue_details["past_shows"] = past_shows_list
         venue_details["past_shows_count"] = len(past_shows_list)
         return render_template("pages/show_venue.html", venue=venue_details)
-    return render_template("errors/404.html")
+    return render_template("errors/404.html"), 404
 
 
 #  Create Venue
 #  ----------------------------------------------------------------
-@app.route("/venues/create", methods=["GET"])
+@bp.route("/venues/create", methods=["GET"])
 def create_venue_form():
     form = VenueForm()
     return render_template("forms/new_venue.html", form=form)
 
 
-@app.route("/venues/create", methods=["POST"])
+@bp.route("/venues/create", methods=["POST"])
 def create_venue_submission():
     try:
         seeking_talent = False
@@ -165,7 +190,7 @@ def create_venue_submission():
     return render_template("pages/home.html")
 
 
-@app.route("/venues/<venue_id>", methods=["DELETE"])
+@bp.route("/venues/<venue_id>", methods=["DELETE"])
 def delete_venue(venue_id):
     venue_data = Venue.query.get(venue_id)
     if venue_data:
@@ -175,18 +200,17 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route("/artists")
+@bp.route("/artists")
+@page_cache.cached("artists")
 def artists():
-    artist_query = Artist.query.all()
-    artist_list = list(map(Artist.short, artist_query))
-    return render_template("pages/artists.html", artists=artist_list)
+    page = keyset_page(Artist.query, Artist, (Artist.id,), **page_args())
+    artist_list = list(map(Artist.short, page.items))
+    return render_template("pages/artists.html", artists=artist_list, page=page)
 
 
-@app.route("/artists/search", methods=["POST"])
+@bp.route("/artists/search", methods=["POST"])
 def search_artists():
-    artist_query = Artist.query.filter(
-        Artist.name.ilike("%" + request.form["search_term"] + "%")
-    )
+    artist_query = search(Artist, request.form.get("search_term"))
     artist_list = list(map(Artist.short, artist_query))
     response = {"count": len(artist_list), "data": artist_list}
     return render_template(
@@ -196,37 +220,32 @@ def search_artists():
     )
 
 
-@app.route("/artists/<int:artist_id>")
+@bp.route("/artists/<int:artist_id>")
+@page_cache.cached("artist")
 def show_artist(artist_id):
     artist_query = Artist.query.get(artist_id)
     if artist_query:
         artist_details = Artist.details(artist_query)
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        new_shows_query = (
-            Show.query.options(db.joinedload(Show.Artist))
+        shows_query = (
+            Show.query.options(db.joinedload(Show.Venue))
             .filter(Show.artist_id == artist_id)
-            .filter(Show.start_time > current_time)
+            .order_by(Show.start_time, Show.id)
             .all()
         )
-        new_shows_list = list(map(Show.venue_details, new_shows_query))
+        past_shows_list, new_shows_list = past_and_upcoming(
+            shows_query, Show.venue_details
+        )
         artist_details["upcoming_shows"] = new_shows_list
         artist_details["upcoming_shows_count"] = len(new_shows_list)
-        past_shows_query = (
-            Show.query.options(db.joinedload(Show.Artist))
-            .filter(Show.artist_id == artist_id)
-            .filter(Show.start_time <= current_time)
-            .all()
-        )
-        past_shows_list = list(map(Show.venue_details, past_shows_query))
         artist_details["past_shows"] = past_shows_list
         artist_details["past_shows_count"] = len(past_shows_list)
         return render_template("pages/show_artist.html", artist=artist_details)
-    return render_template("errors/404.html")
+    return render_template("errors/404.html"), 404
 
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route("/artists/<int:artist_id>/edit", methods=["GET"])
+@bp.route("/artists/<int:artist_id>/edit", methods=["GET"])
 def edit_artist(artist_id):
     form = ArtistForm()
     artist_query = Artist.query.get(artist_id)
@@ -249,7 +268,7 @@ def edit_artist(artist_id):
     return render_template("errors/404.html")
 
 
-@app.route("/artists/<int:artist_id>/edit", methods=["POST"])
+@bp.route("/artists/<int:artist_id>/edit", methods=["POST"])
 def edit_artist_submission(artist_id):
     form = ArtistForm(request.form)
     artist_data = Artist.query.get(artist_id)
@@ -272,13 +291,13 @@ def edit_artist_submission(artist_id):
             artist_data.seeking_description = seeking_description
             artist_data.seeking_venue = seeking_venue
             Artist.update(artist_data)
-            return redirect(url_for("show_artist", artist_id=artist_id))
+            return redirect(url_for("main.show_artist", artist_id=artist_id))
         else:
             print(form.errors)
     return render_template("errors/404.html"), 404
 
 
-@app.route("/venues/<int:venue_id>/edit", methods=["GET"])
+@bp.route("/venues/<int:venue_id>/edit", methods=["GET"])
 def edit_venue(venue_id):
     form = VenueForm()
     venue = Venue.query.get(venue_id)
@@ -299,7 +318,7 @@ def edit_venue(venue_id):
     return render_template("errors/404.html")
 
 
-@app.route("/venues/<int:venue_id>/edit", methods=["POST"])
+@bp.route("/venues/<int:venue_id>/edit", methods=["POST"])
 def edit_venue_submission(venue_id):
     form = VenueForm(request.form)
     venue_data = Venue.query.get(venue_id)
@@ -323,7 +342,7 @@ def edit_venue_submission(venue_id):
             venue_data.name = seeking_description
             venue_data.name = seeking_talent
             Venue.update(venue_data)
-            return redirect(url_for("show_venue", venue_id=venue_id))
+            return redirect(url_for("main.show_venue", venue_id=venue_id))
         else:
             print(form.errors)
     return render_template("errors/404.html"), 404
@@ -331,13 +350,13 @@ def edit_venue_submission(venue_id):
 
 #  Create Artist
 #  ----------------------------------------------------------------
-@app.route("/artists/create", methods=["GET"])
+@bp.route("/artists/create", methods=["GET"])
 def create_artist_form():
     form = ArtistForm()
     return render_template("forms/new_artist.html", form=form)
 
 
-@app.route("/artists/create", methods=["POST"])
+@bp.route("/artists/create", methods=["POST"])
 def create_artist_submission():
     try:
         seeking_venue = False
@@ -374,22 +393,28 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 
-@app.route("/shows")
+@bp.route("/shows")
+@page_cache.cached("shows")
 def shows():
+    # the venues and artists are loaded for the page's shows only, once
+    # the LIMIT has been applied, rather than joined to every show
     shows_query = Show.query.options(
-        db.joinedload(Show.Venue), db.joinedload(Show.Artist)
-    ).all()
-    shows_list = list(map(Show.details, shows_query))
-    return render_template("pages/shows.html", shows=shows_list)
+        db.selectinload(Show.Venue), db.selectinload(Show.Artist)
+    )
+    page = keyset_page(
+        shows_query, Show, (Show.start_time, Show.id), **page_args()
+    )
+    shows_list = list(map(Show.details, page.items))
+    return render_template("pages/shows.html", shows=shows_list, page=page)
 
 
-@app.route("/shows/create")
+@bp.route("/shows/create")
 def create_shows():
     form = ShowForm()
     return render_template("forms/new_show.html", form=form)
 
 
-@app.route("/shows/create", methods=["POST"])
+@bp.route("/shows/create", methods=["POST"])
 def create_show_submission():
     try:
         new_show = Show(
@@ -404,26 +429,17 @@ def create_show_submission():
     return render_template("pages/home.html")
 
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template("errors/404.html"), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
     return render_template("errors/500.html"), 500
 
 
-if not app.debug:
-    file_handler = FileHandler("error.log")
-    file_handler.setFormatter(
-        Formatter(
-            "%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]")
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info("errors")
+app = create_app()
 
 # ----------------------------------------------------------------------------#
 # Launch.
@@ -0,0 +1,66 @@
+"""Time the datetime Jinja filter against the previous implementation.
+
+    python bench_filters.py --count 50000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from flask import Flask
+
+from filters import format_datetime
+
+
+def format_datetime_parse(value, format="medium"):
+    # The filter as it was before filters.py: re-parse and re-resolve the
+    # babel pattern on every call.
+    date = dateutil.parser.parse(str(value))
+    if format == "full":
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == "medium":
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def timed(filter, values):
+    start = time.perf_counter()
+    for value in values:
+        filter(value, "full")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--distinct", type=int, default=500,
+                        help="distinct timestamps in the repeated run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = datetime(2019, 1, 1)
+    unique = [start + timedelta(minutes=rng.randrange(10 ** 6))
+              for _ in range(args.count)]
+    repeated = [rng.choice(unique[:args.distinct]) for _ in range(args.count)]
+
+    app = Flask(__name__)
+    baseline = timed(format_datetime_parse, unique)
+    # outside a request there is no per-request cache
+    compiled = timed(format_datetime, unique)
+    with app.test_request_context():
+        cached = timed(format_datetime, repeated)
+
+    print("{} timestamps".format(args.count))
+    print("{:<40} {:>8.3f}s".format("parse + babel.format_datetime", baseline))
+    print("{:<40} {:>8.3f}s  x{:.1f}".format(
+        "compiled pattern", compiled, baseline / compiled))
+    print("{:<40} {:>8.3f}s  x{:.1f}".format(
+        "compiled + request LRU ({} distinct)".format(args.distinct),
+        cached, baseline / cached))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare venue search latency with and without the pg_trgm indexes.
+
+Seeds a scratch database with synthetic venues, times search() against the
+plain table (the old sequential ILIKE scan) and again after creating the
+indexes from migration 4f0c8d2a9b31.
+
+    createdb fyyur_bench
+    python bench_search.py --database postgresql:///fyyur_bench --rows 100000
+"""
+import argparse
+import random
+import string
+import time
+
+from app import app
+from forms import genre_choices
+from models import db, Venue
+from search import search
+
+SEARCH_TERMS = ["hop", "piano", "san fran", "Jazz", "zzq"]
+
+
+def random_word(rng):
+    return "".join(rng.choice(string.ascii_lowercase)
+                   for _ in range(rng.randint(4, 10)))
+
+
+def seed(rows, rng):
+    cities = ["San Francisco", "New York", "Austin", "Seattle", "Chicago"]
+    genres = [name for name, _ in genre_choices]
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "name": "The {} {}".format(random_word(rng).title(),
+                                       rng.choice(["Hop", "Hall", "Piano Bar",
+                                                   "Lounge", "Club"])),
+            "city": rng.choice(cities),
+            "state": "CA",
+            "genres": rng.sample(genres, 2),
+        })
+        if len(batch) == 10000:
+            db.session.bulk_insert_mappings(Venue, batch)
+            batch = []
+    if batch:
+        db.session.bulk_insert_mappings(Venue, batch)
+    db.session.commit()
+
+
+def create_indexes():
+    db.session.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    db.session.execute('CREATE INDEX ix_venue_name_trgm ON "Venue" '
+                       "USING gin (name gin_trgm_ops)")
+    db.session.execute('CREATE INDEX ix_venue_city_trgm ON "Venue" '
+                       "USING gin (city gin_trgm_ops)")
+    db.session.execute('CREATE INDEX ix_venue_genres ON "Venue" '
+                       "USING gin (genres)")
+    db.session.execute('ANALYZE "Venue"')
+    db.session.commit()
+
+
+def time_searches(repeat):
+    results = {}
+    for term in SEARCH_TERMS:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            count = len(search(Venue, term).all())
+        results[term] = ((time.perf_counter() - start) / repeat * 1000, count)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="postgresql:///fyyur_bench")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app.config["SQLALCHEMY_DATABASE_URI"] = args.database
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(args.rows, random.Random(args.seed))
+        db.session.execute('ANALYZE "Venue"')
+        before = time_searches(args.repeat)
+        create_indexes()
+        after = time_searches(args.repeat)
+        db.session.remove()
+        db.drop_all()
+
+    print("{:<10} {:>8} {:>12} {:>12}".format(
+        "term", "matches", "ilike (ms)", "trgm (ms)"))
+    for term in SEARCH_TERMS:
+        print("{:<10} {:>8} {:>12.2f} {:>12.2f}".format(
+            term, before[term][1], before[term][0], after[term][0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import request, session
+
+
+class LocalCache:
+    """In-process LRU whose entries also expire after their TTL."""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def version(self, name):
+        return self.versions.get(name, 0)
+
+    def bump(self, name):
+        with self.lock:
+            self.versions[name] = self.versions.get(name, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+class RedisCache:
+    """Stores pages in Redis, or anything with the same get/setex/delete/
+    incr/scan_iter methods, so every worker shares one cache."""
+
+    def __init__(self, client, prefix="fyyur:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, ttl, value)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def version(self, name):
+        return int(self.client.get(self.prefix + "version:" + name) or 0)
+
+    def bump(self, name):
+        self.client.incr(self.prefix + "version:" + name)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+class PageCache:
+    """Caches rendered GET pages.
+
+    A page for a single entity is stored under "<name>:<id>" and is evicted
+    by invalidating that key. Listing pages are stored per query string
+    under a version number for the listing, so invalidating the bare name
+    ("shows") drops every page of it at once.
+
+    The local backend is per process, so its invalidations do not reach
+    other workers; with more than one worker use the redis backend.
+    """
+
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or LocalCache()
+        self.ttl = ttl
+
+    def init_app(self, app):
+        backend = app.config.get("CACHE_BACKEND", "local")
+        if backend == "redis":
+            import redis
+
+            self.backend = RedisCache(
+                redis.Redis.from_url(app.config.get("CACHE_REDIS_URL")
+                                     or "redis://localhost:6379/0"))
+        else:
+            self.backend = LocalCache(app.config.get("CACHE_SIZE", 512))
+        self.ttl = app.config.get("CACHE_TTL", 60)
+
+    def key(self, name, view_args):
+        if view_args:
+            return ":".join([name] + [str(v) for v in view_args.values()])
+        return "{}:{}?{}".format(name, self.backend.version(name),
+                                 request.query_string.decode())
+
+    def cached(self, name):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # a pending flash message would be rendered into the page
+                if session.get("_flashes"):
+                    return view(**kwargs)
+                key = self.key(name, kwargs)
+                page = self.backend.get(key)
+                if page is None:
+                    page = view(**kwargs)
+                    # only a bare string is a 200 page; a 404, a redirect
+                    # or anything else with its own status is not kept
+                    if not isinstance(page, str):
+                        return page
+                    self.backend.set(key, page, self.ttl)
+                return page
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, *keys):
+        for key in keys:
+            if ":" in key:
+                self.backend.delete(key)
+            else:
+                self.backend.bump(key)
+
+    def clear(self):
+        self.backend.clear()
+
+
+page_cache = PageCache()
@@ -1,5 +1,7 @@
 import os
 
+from pool import engine_options
+
 SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -9,3 +11,14 @@ DEBUG = True
 
 SQLALCHEMY_DATABASE_URI = "postgresql:///trivia"
 SQLALCHEMY_TRACK_MODIFICATIONS = True
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+# Rendered page cache: "local" keeps an LRU in each process, "redis" shares
+# one cache between workers (needs the redis package). A local cache only
+# evicts pages in the process that made the change, so run more than one
+# worker with redis; setting CACHE_REDIS_URL makes it the default.
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+CACHE_BACKEND = os.environ.get(
+    "CACHE_BACKEND", "redis" if CACHE_REDIS_URL else "local")
+CACHE_SIZE = 512
+CACHE_TTL = 60
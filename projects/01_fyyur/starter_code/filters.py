@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import babel.dates
+import dateutil.parser
+from babel import Locale
+from flask import g, has_app_context
+
+DATETIME_FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+REQUEST_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=None)
+def compiled_pattern(format, locale):
+    """The parsed babel DateTimePattern and Locale for a format name or
+    pattern, resolved once per (format, locale). Babel's own "long" and
+    "short" formats combine two patterns and are left to babel."""
+    locale = Locale.parse(locale or babel.dates.LC_TIME)
+    if format in DATETIME_FORMATS:
+        return babel.dates.parse_pattern(DATETIME_FORMATS[format]), locale
+    if format in ("long", "short"):
+        return None, locale
+    return babel.dates.parse_pattern(format), locale
+
+
+def request_cache():
+    """LRU of formatted strings that lives for the current request."""
+    cache = g.get("formatted_datetimes")
+    if cache is None:
+        cache = g.formatted_datetimes = OrderedDict()
+    return cache
+
+
+def format_datetime(value, format="medium", locale=None):
+    cache = request_cache() if has_app_context() else None
+    key = (value, format, locale)
+    if cache is not None and key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+
+    date = value if isinstance(value, datetime) else dateutil.parser.parse(
+        str(value))
+    if date.tzinfo is None:
+        # babel treats naive datetimes as UTC
+        date = date.replace(tzinfo=timezone.utc)
+    pattern, parsed_locale = compiled_pattern(format, locale)
+    if pattern is None:
+        formatted = babel.dates.format_datetime(date, format,
+                                                locale=parsed_locale)
+    else:
+        formatted = pattern.apply(date, parsed_locale)
+
+    if cache is not None:
+        cache[key] = formatted
+        if len(cache) > REQUEST_CACHE_SIZE:
+            cache.popitem(last=False)
+    return formatted
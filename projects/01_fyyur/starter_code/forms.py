@@ -4,6 +4,29 @@ from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
 from wtforms.validators import DataRequired, AnyOf, URL
 
 
+genre_choices = [
+    ("Alternative", "Alternative"),
+    ("Blues", "Blues"),
+    ("Classical", "Classical"),
+    ("Country", "Country"),
+    ("Electronic", "Electronic"),
+    ("Folk", "Folk"),
+    ("Funk", "Funk"),
+    ("Hip-Hop", "Hip-Hop"),
+    ("Heavy Metal", "Heavy Metal"),
+    ("Instrumental", "Instrumental"),
+    ("Jazz", "Jazz"),
+    ("Musical Theatre", "Musical Theatre"),
+    ("Pop", "Pop"),
+    ("Punk", "Punk"),
+    ("R&B", "R&B"),
+    ("Reggae", "Reggae"),
+    ("Rock n Roll", "Rock n Roll"),
+    ("Soul", "Soul"),
+    ("Other", "Other"),
+]
+
+
 class ShowForm(Form):
     artist_id = StringField("artist_id")
     venue_id = StringField("venue_id")
@@ -78,27 +101,7 @@ class VenueForm(Form):
     genres = SelectMultipleField(
         "genres",
         validators=[DataRequired()],
-        choices=[
-            ("Alternative", "Alternative"),
-            ("Blues", "Blues"),
-            ("Classical", "Classical"),
-            ("Country", "Country"),
-            ("Electronic", "Electronic"),
-            ("Folk", "Folk"),
-            ("Funk", "Funk"),
-            ("Hip-Hop", "Hip-Hop"),
-            ("Heavy Metal", "Heavy Metal"),
-            ("Instrumental", "Instrumental"),
-            ("Jazz", "Jazz"),
-            ("Musical Theatre", "Musical Theatre"),
-            ("Pop", "Pop"),
-            ("Punk", "Punk"),
-            ("R&B", "R&B"),
-            ("Reggae", "Reggae"),
-            ("Rock n Roll", "Rock n Roll"),
-            ("Soul", "Soul"),
-            ("Other", "Other"),
-        ],
+        choices=genre_choices,
     )
     facebook_link = StringField("facebook_link", validators=[URL()])
 
@@ -168,26 +171,6 @@ class ArtistForm(Form):
     genres = SelectMultipleField(
         "genres",
         validators=[DataRequired()],
-        choices=[
-            ("Alternative", "Alternative"),
-            ("Blues", "Blues"),
-            ("Classical", "Classical"),
-            ("Country", "Country"),
-            ("Electronic", "Electronic"),
-            ("Folk", "Folk"),
-            ("Funk", "Funk"),
-            ("Hip-Hop", "Hip-Hop"),
-            ("Heavy Metal", "Heavy Metal"),
-            ("Instrumental", "Instrumental"),
-            ("Jazz", "Jazz"),
-            ("Musical Theatre", "Musical Theatre"),
-            ("Pop", "Pop"),
-            ("Punk", "Punk"),
-            ("R&B", "R&B"),
-            ("Reggae", "Reggae"),
-            ("Rock n Roll", "Rock n Roll"),
-            ("Soul", "Soul"),
-            ("Other", "Other"),
-        ],
+        choices=genre_choices,
     )
     facebook_link = StringField("facebook_link", validators=[URL()])
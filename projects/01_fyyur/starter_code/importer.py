@@ -0,0 +1,126 @@
+import csv
+import json
+import os
+
+import dateutil.parser
+
+from cache import page_cache
+from models import db, Venue, Artist, Show, ImportProgress
+
+MODELS = {"venues": Venue, "artists": Artist, "shows": Show}
+BOOLEAN_COLUMNS = ("seeking_talent", "seeking_venue")
+
+
+class RecordError(Exception):
+    def __init__(self, number, message):
+        super().__init__("record {}: {}".format(number, message))
+        self.number = number
+
+
+def read_records(path):
+    """Yield the rows of a CSV (with a header line) or JSON-lines file as
+    dicts, one at a time."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class ForeignKeys:
+    """Resolves a show's venue and artist given either as ids or by name.
+
+    Names are loaded into a dict once per import, so resolving a row never
+    touches the database.
+    """
+
+    def __init__(self):
+        self.ids = {}
+
+    def lookup(self, model):
+        if model not in self.ids:
+            self.ids[model] = {}
+            for id, name in db.session.query(model.id, model.name):
+                self.ids[model].setdefault(name, id)
+        return self.ids[model]
+
+    def resolve(self, record, model, key):
+        if record.get(key + "_id"):
+            return int(record[key + "_id"])
+        name = record.get(key) or record.get(key + "_name")
+        id = self.lookup(model).get(name)
+        if id is None:
+            raise LookupError("unknown {} {!r}".format(key, name))
+        return id
+
+
+def to_mapping(model, record, foreign_keys):
+    columns = model.__table__.columns.keys()
+    mapping = {key: value for key, value in record.items()
+               if key in columns and key != "id" and value != ""}
+    if "genres" in mapping and isinstance(mapping["genres"], str):
+        mapping["genres"] = [genre.strip()
+                             for genre in mapping["genres"].split(",")]
+    for column in BOOLEAN_COLUMNS:
+        if isinstance(mapping.get(column), str):
+            mapping[column] = mapping[column].lower() in ("y", "yes", "true", "1")
+    if model is Show:
+        mapping["venue_id"] = foreign_keys.resolve(record, Venue, "venue")
+        mapping["artist_id"] = foreign_keys.resolve(record, Artist, "artist")
+        if isinstance(mapping.get("start_time"), str):
+            mapping["start_time"] = dateutil.parser.parse(mapping["start_time"])
+    return mapping
+
+
+def import_file(path, kind, batch_size=1000, progress=print):
+    """Insert every record of path as a kind ("venues", "artists" or
+    "shows") row, batch_size rows per INSERT and commit.
+
+    The number of committed records is kept in import_progress, updated in
+    the same transaction as each batch. A rerun after a failure skips them
+    and continues with the next batch; the row is removed once the whole
+    file is in.
+    """
+    model = MODELS[kind]
+    state = ImportProgress.query.get(os.path.abspath(path))
+    if state is None:
+        state = ImportProgress(path=os.path.abspath(path), done=0)
+    done = state.done
+    if done:
+        progress("{}: resuming after {} rows".format(kind, done))
+    foreign_keys = ForeignKeys()
+    batch = []
+    count = done
+
+    def flush():
+        db.session.bulk_insert_mappings(model, batch)
+        state.done = count
+        db.session.add(state)
+        db.session.commit()
+        progress("{}: {} rows".format(kind, count))
+        batch.clear()
+
+    try:
+        for number, record in enumerate(read_records(path), start=1):
+            if number <= done:
+                continue
+            try:
+                batch.append(to_mapping(model, record, foreign_keys))
+            except (LookupError, ValueError) as e:
+                db.session.rollback()
+                raise RecordError(number, e)
+            count = number
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        if state.done:
+            db.session.delete(state)
+            db.session.commit()
+    finally:
+        # the model write methods that normally evict cached pages were
+        # bypassed, for the batches of a failed import too
+        page_cache.clear()
+    return count - done
@@ -1,16 +1,22 @@
-from models import db
-from flask import Flask
-from flask_migrate import Migrate, MigrateCommand
+from app import app
+from importer import MODELS, import_file
+from flask_migrate import MigrateCommand
 from flask_script import Manager
 
-app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "postgres:///trivia"
+manager = Manager(app)
+manager.add_command("db", MigrateCommand)
 
 
-migrate = Migrate(app, db)
+@manager.option("path", help="CSV or JSON-lines file to import")
+@manager.option("-k", "--kind", dest="kind", required=True,
+                choices=sorted(MODELS), help="what the file holds")
+@manager.option("-b", "--batch-size", dest="batch_size", type=int,
+                default=1000, help="rows per INSERT and commit")
+def load(kind, path, batch_size):
+    """Bulk import venues, artists or shows; rerun to resume after a failure."""
+    count = import_file(path, kind, batch_size=batch_size)
+    print("{}: imported {} rows from {}".format(kind, count, path))
 
-manager = Manager(app)
-manager.add_command("db", MigrateCommand)
 
 if __name__ == "__main__":
     manager.run()
@@ -0,0 +1,48 @@
+"""search indexes on Venue and Artist
+
+Revision ID: 4f0c8d2a9b31
+Revises: 72935d2b43e6
+Create Date: 2026-10-18 10:12:40.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f0c8d2a9b31'
+down_revision = '72935d2b43e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Artist.genres was created as a plain string; the model (and the GIN
+    # array index below) expects an array like Venue.genres.
+    op.execute(
+        'ALTER TABLE "Artist" ALTER COLUMN genres TYPE VARCHAR[] USING '
+        'CASE WHEN genres IS NULL THEN NULL '
+        "WHEN genres LIKE '{%' THEN genres::VARCHAR[] "
+        'ELSE ARRAY[genres]::VARCHAR[] END'
+    )
+    for table in ('Venue', 'Artist'):
+        prefix = table.lower()
+        op.create_index('ix_{}_name_trgm'.format(prefix), table, ['name'],
+                        postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_{}_city_trgm'.format(prefix), table, ['city'],
+                        postgresql_using='gin',
+                        postgresql_ops={'city': 'gin_trgm_ops'})
+        op.create_index('ix_{}_genres'.format(prefix), table, ['genres'],
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        prefix = table.lower()
+        op.drop_index('ix_{}_genres'.format(prefix), table_name=table)
+        op.drop_index('ix_{}_city_trgm'.format(prefix), table_name=table)
+        op.drop_index('ix_{}_name_trgm'.format(prefix), table_name=table)
+    op.alter_column('Artist', 'genres', type_=sa.String(length=120),
+                    postgresql_using='genres::VARCHAR(120)')
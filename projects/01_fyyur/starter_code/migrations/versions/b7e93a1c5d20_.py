@@ -0,0 +1,28 @@
+"""indexes on Show(venue_id, start_time) and Show(artist_id, start_time)
+
+Revision ID: b7e93a1c5d20
+Revises: 4f0c8d2a9b31
+Create Date: 2026-10-18 14:03:51.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e93a1c5d20'
+down_revision = '4f0c8d2a9b31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'Show',
+                    ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'Show',
+                    ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
@@ -0,0 +1,29 @@
+"""indexes on the /shows and /venues sort keys: Show(start_time, id) and
+Venue(city, state, id)
+
+Revision ID: c3d81f6e2a47
+Revises: b7e93a1c5d20
+Create Date: 2026-10-18 16:12:07.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d81f6e2a47'
+down_revision = 'b7e93a1c5d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_id', 'Show',
+                    ['start_time', 'id'], unique=False)
+    op.create_index('ix_venue_city_state_id', 'Venue',
+                    ['city', 'state', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_city_state_id', table_name='Venue')
+    op.drop_index('ix_show_start_time_id', table_name='Show')
@@ -0,0 +1,27 @@
+"""import_progress table for resumable bulk imports
+
+Revision ID: d5a0c7b94e18
+Revises: c3d81f6e2a47
+Create Date: 2026-10-18 16:40:22.906513
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a0c7b94e18'
+down_revision = 'c3d81f6e2a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_progress',
+                    sa.Column('path', sa.String(), nullable=False),
+                    sa.Column('done', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('path'))
+
+
+def downgrade():
+    op.drop_table('import_progress')
@@ -1,12 +1,11 @@
-from flask import Flask
-from flask_moment import Moment
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ARRAY, ForeignKey
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy import Index, func
+from sqlalchemy.dialects.postgresql import ARRAY
 from flask_sqlalchemy import SQLAlchemy
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object("config")
-db = SQLAlchemy(app)
+from cache import page_cache
+
+db = SQLAlchemy()
 
 # ----------------------------------------------------------------------------#
 # Models.
@@ -30,6 +29,10 @@ class Venue(db.Model):
     image_link = Column(String(500))
     shows = db.relationship("Show", backref="Venue", lazy="dynamic")
 
+    areas_order = (city, state, id)
+
+    __table_args__ = (Index("ix_venue_city_state_id", city, state, id),)
+
     def __init__(
         self,
         name,
@@ -59,17 +62,51 @@ class Venue(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        page_cache.invalidate("venues", "venue:{}".format(self.id))
 
     def update(self):
         db.session.commit()
+        page_cache.invalidate(*self.cached_pages())
 
     def delete(self):
+        cached_pages = self.cached_pages()
         db.session.delete(self)
         db.session.commit()
+        page_cache.invalidate(*cached_pages)
+
+    def cached_pages(self):
+        # Every page that renders this venue's details.
+        artist_ids = (
+            db.session.query(Show.artist_id)
+            .filter(Show.venue_id == self.id)
+            .distinct()
+        )
+        return ["venues", "shows", "venue:{}".format(self.id)] + [
+            "artist:{}".format(artist_id) for artist_id, in artist_ids
+        ]
 
     def short(self):
         return {"id": self.id, "name": self.name}
 
+    @classmethod
+    def areas(cls, current_time):
+        # One query for the /venues listing: every venue with its city/state
+        # and the number of shows starting after current_time. The count is
+        # a correlated subquery so it only runs for the venues on the page,
+        # each one an index range scan on Show(venue_id, start_time).
+        num_upcoming_shows = (
+            db.session.query(func.count())
+            .filter(Show.venue_id == cls.id, Show.start_time > current_time)
+            .correlate(cls)
+            .label("num_upcoming_shows")
+        )
+        return (
+            db.session.query(
+                cls.city, cls.state, cls.id, cls.name, num_upcoming_shows
+            )
+            .order_by(*cls.areas_order)
+        )
+
     def long(self):
         print(self)
         return {
@@ -139,9 +176,22 @@ class Artist(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        page_cache.invalidate("artists", "artist:{}".format(self.id))
 
     def update(self):
         db.session.commit()
+        page_cache.invalidate(*self.cached_pages())
+
+    def cached_pages(self):
+        # Every page that renders this artist's details.
+        venue_ids = (
+            db.session.query(Show.venue_id)
+            .filter(Show.artist_id == self.id)
+            .distinct()
+        )
+        return ["artists", "shows", "artist:{}".format(self.id)] + [
+            "venue:{}".format(venue_id) for venue_id, in venue_ids
+        ]
 
     def short(self):
         return {"id": self.id, "name": self.name}
@@ -170,6 +220,13 @@ class Show(db.Model):
     artist_id = Column(Integer, ForeignKey("Artist.id"))
     start_time = Column(DateTime, nullable=False)
 
+    __table_args__ = (
+        Index("ix_show_venue_id_start_time", venue_id, start_time),
+        Index("ix_show_artist_id_start_time", artist_id, start_time),
+        # the /shows sort key, so a page is an index range scan
+        Index("ix_show_start_time_id", start_time, id),
+    )
+
     def __init__(self, venue_id, artist_id, start_time):
         self.venue_id = venue_id
         self.artist_id = artist_id
@@ -178,6 +235,12 @@ class Show(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        page_cache.invalidate(
+            "shows",
+            "venues",
+            "venue:{}".format(self.venue_id),
+            "artist:{}".format(self.artist_id),
+        )
 
     def details(self):
         return {
@@ -204,3 +267,13 @@ class Show(db.Model):
             "venue_image_link": self.Venue.image_link,
             "start_time": self.start_time,
         }
+
+
+class ImportProgress(db.Model):
+    # how many records of a file the bulk importer has committed, written
+    # in the same transaction as each batch so a rerun resumes right after
+    # the last batch that made it in
+    __tablename__ = "import_progress"
+
+    path = Column(String, primary_key=True)
+    done = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,64 @@
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import aliased
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class Page:
+    """One page of rows plus the ids to pass as ?before= / ?after= to
+    reach the neighbouring pages (None when there is no such page)."""
+
+    def __init__(self, items, limit, prev_cursor=None, next_cursor=None):
+        self.items = items
+        self.limit = limit
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+
+def keyset_page(query, model, order_by, after=None, before=None,
+                limit=PAGE_SIZE):
+    """Seek to the rows of query that sort right after (or before) the row
+    with id after (before), instead of counting past them with OFFSET.
+
+    order_by is the tuple of model columns the page is sorted on and must
+    end with model.id so the order is total. The rows returned by query
+    must expose that id as .id.
+    """
+    limit = max(1, min(limit or PAGE_SIZE, MAX_PAGE_SIZE))
+    keys = tuple_(*order_by)
+    cursor = before or after
+    if cursor:
+        row = aliased(model)
+        cursor_keys = (
+            select([getattr(row, column.key) for column in order_by])
+            .where(row.id == cursor)
+            .as_scalar()
+        )
+        query = query.filter(keys < cursor_keys if before else keys > cursor_keys)
+    query = query.order_by(None)
+
+    if before:
+        rows = (
+            query.order_by(*[column.desc() for column in order_by])
+            .limit(limit + 1)
+            .all()
+        )
+        has_prev = len(rows) > limit
+        rows = rows[:limit][::-1]
+        return Page(
+            rows,
+            limit,
+            prev_cursor=rows[0].id if has_prev else None,
+            next_cursor=rows[-1].id if rows else None,
+        )
+
+    rows = query.order_by(*order_by).limit(limit + 1).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    return Page(
+        rows,
+        limit,
+        prev_cursor=rows[0].id if after and rows else None,
+        next_cursor=rows[-1].id if has_next else None,
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import or_
+
+from forms import genre_choices
+
+genres_by_name = {name.lower(): name for name, _ in genre_choices}
+
+
+def search(model, search_term):
+    """Venues or artists whose name or city contains search_term, or whose
+    genres include it.
+
+    The ILIKE filters are served by the pg_trgm GIN indexes and the genre
+    filter by the GIN array index, see migration 4f0c8d2a9b31.
+    """
+    search_term = (search_term or "").strip()
+    pattern = f"%{search_term}%"
+    filters = [model.name.ilike(pattern), model.city.ilike(pattern)]
+    genre = genres_by_name.get(search_term.lower())
+    if genre:
+        filters.append(model.genres.contains([genre]))
+    return model.query.filter(or_(*filters)).order_by(model.name, model.id)
@@ -0,0 +1,376 @@
+import gc
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from app import app
+from cache import PageCache, RedisCache, page_cache
+from importer import RecordError, import_file
+from models import db, Venue, Artist, Show, ImportProgress
+from pool import engine_options, pool_metrics
+from pagination import keyset_page
+from search import search
+
+
+class QueryCounter:
+    """Records every SQL statement sent to any engine while active."""
+
+    def __init__(self):
+        self.statements = []
+        self.parameters = []
+
+    def __enter__(self):
+        event.listen(Engine, "before_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+
+class FakeRedis:
+    """Just enough of the redis client for RedisCache."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value.encode("utf-8")
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+
+    def scan_iter(self, pattern):
+        return [key for key in list(self.data)
+                if key.startswith(pattern.rstrip("*"))]
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.app = app
+        self.app.config["TESTING"] = True
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql:///fyyur_test"
+        self.client = app.test_client()
+        page_cache.clear()
+        with self.app.app_context():
+            db.create_all()
+            self.seed()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def seed(self):
+        now = datetime.now()
+        venues = [
+            Venue("The Musical Hop", ["Jazz"], "1015 Folsom Street",
+                  "San Francisco", "CA", "123-123-1234", "", "", ""),
+            Venue("Park Square Live", ["Rock n Roll"], "34 Whiskey Moore Ave",
+                  "San Francisco", "CA", "415-000-1234", "", "", ""),
+            Venue("The Dueling Pianos Bar", ["Classical"], "335 Delancey",
+                  "New York", "NY", "914-003-1132", "", "", ""),
+        ]
+        artist = Artist("Guns N Petals", ["Rock n Roll"], "San Francisco",
+                        "CA", "326-123-5000", "", "", "")
+        db.session.add_all(venues + [artist])
+        db.session.flush()
+        self.venue_id, self.artist_id = venues[0].id, artist.id
+        for days in (-2, 1, 2):
+            db.session.add(
+                Show(venues[0].id, artist.id, now + timedelta(days=days)))
+        db.session.add(Show(venues[2].id, artist.id, now + timedelta(days=3)))
+        db.session.commit()
+
+    def test_venues_grouped_by_area(self):
+        with self.app.app_context():
+            areas = Venue.areas(datetime.now()).all()
+        counts = {name: count for _, _, _, name, count in areas}
+        self.assertEqual(counts["The Musical Hop"], 2)
+        self.assertEqual(counts["Park Square Live"], 0)
+        self.assertEqual(counts["The Dueling Pianos Bar"], 1)
+        self.assertEqual(
+            [(city, state) for city, state, _, _, _ in areas],
+            [("New York", "NY"), ("San Francisco", "CA"),
+             ("San Francisco", "CA")],
+        )
+
+    def test_venues_single_query(self):
+        with QueryCounter() as counter:
+            response = self.client.get("/venues")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"The Dueling Pianos Bar", response.data)
+        self.assertEqual(len(counter.statements), 1)
+
+    def test_search_venues(self):
+        with self.app.app_context():
+            by_name = [v.name for v in search(Venue, "PIANO")]
+            by_city = [v.name for v in search(Venue, "san fran")]
+            by_genre = [v.name for v in search(Venue, "jazz")]
+        self.assertEqual(by_name, ["The Dueling Pianos Bar"])
+        self.assertEqual(by_city, ["Park Square Live", "The Musical Hop"])
+        self.assertEqual(by_genre, ["The Musical Hop"])
+
+    def test_keyset_pages(self):
+        with self.app.app_context():
+            order = (Show.start_time, Show.id)
+            first = keyset_page(Show.query, Show, order, limit=3)
+            second = keyset_page(Show.query, Show, order,
+                                 after=first.next_cursor, limit=3)
+            back = keyset_page(Show.query, Show, order,
+                               before=second.prev_cursor, limit=3)
+            times = [show.start_time for show in first.items + second.items]
+            self.assertEqual(len(first.items), 3)
+            self.assertEqual(len(second.items), 1)
+            self.assertEqual(times, sorted(times))
+            self.assertIsNone(first.prev_cursor)
+            self.assertIsNone(second.next_cursor)
+            self.assertEqual(back.items, first.items)
+            self.assertIsNone(back.prev_cursor)
+
+    def test_venues_page_links(self):
+        response = self.client.get("/venues?limit=2")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b"Park Square Live", response.data)
+        self.assertIn(b"after=", response.data)
+
+    def test_show_venue_single_show_query(self):
+        with QueryCounter() as counter:
+            response = self.client.get(f"/venues/{self.venue_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Guns N Petals", response.data)
+        # one statement for the venue, one for its shows and their artists
+        self.assertEqual(len(counter.statements), 2)
+
+    def test_show_artist_single_show_query(self):
+        with QueryCounter() as counter:
+            response = self.client.get(f"/artists/{self.artist_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"The Dueling Pianos Bar", response.data)
+        self.assertEqual(len(counter.statements), 2)
+
+    def test_cached_pages_invalidated_by_show_insert(self):
+        self.client.get(f"/venues/{self.venue_id}")
+        self.client.get("/shows")
+        with QueryCounter() as counter:
+            self.client.get(f"/venues/{self.venue_id}")
+            self.client.get("/shows")
+        self.assertEqual(len(counter.statements), 0)
+
+        with self.app.app_context():
+            Show(self.venue_id, self.artist_id,
+                 datetime(2035, 1, 1, 20, 0)).insert()
+        with QueryCounter() as counter:
+            venue_page = self.client.get(f"/venues/{self.venue_id}")
+            shows_page = self.client.get("/shows?limit=100")
+        self.assertGreater(len(counter.statements), 0)
+        self.assertIn(b"2035", venue_page.data)
+        self.assertIn(b"2035", shows_page.data)
+
+    def test_missing_page_not_cached(self):
+        with self.app.app_context():
+            venue_id = db.session.query(db.func.max(Venue.id)).scalar() + 1
+        self.assertEqual(
+            self.client.get(f"/venues/{venue_id}").status_code, 404)
+        with self.app.app_context():
+            # added behind the model's back, as the bulk importer does
+            db.session.execute(
+                'INSERT INTO "Venue" (id, name, city, state, genres) '
+                "VALUES (:id, 'The Late Arrival', 'Austin', 'TX', "
+                "ARRAY['Jazz'])",
+                {"id": venue_id})
+            db.session.commit()
+        response = self.client.get(f"/venues/{venue_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"The Late Arrival", response.data)
+
+    def test_redis_backend(self):
+        cache = PageCache(RedisCache(FakeRedis()))
+        renders = []
+
+        @cache.cached("shows")
+        def shows():
+            renders.append(1)
+            return "page {}".format(len(renders))
+
+        with self.app.test_request_context("/shows?limit=5"):
+            self.assertEqual(shows(), "page 1")
+            self.assertEqual(shows(), "page 1")
+            cache.invalidate("shows")
+            self.assertEqual(shows(), "page 2")
+
+    def test_bulk_import_resumes_after_failure(self):
+        directory = tempfile.mkdtemp()
+        venues_path = os.path.join(directory, "venues.csv")
+        with open(venues_path, "w") as f:
+            f.write("name,genres,city,state,seeking_talent\n")
+            for i in range(5):
+                f.write(f'Venue {i},"Jazz,Blues",Austin,TX,y\n')
+        shows_path = os.path.join(directory, "shows.jsonl")
+        records = [{"venue": f"Venue {i}", "artist": "Guns N Petals",
+                    "start_time": "2035-01-0{} 20:00".format(i + 1)}
+                   for i in range(5)]
+        records[3]["venue"] = "Nowhere"
+        with open(shows_path, "w") as f:
+            f.write("\n".join(json.dumps(record) for record in records))
+
+        messages = []
+        with self.app.app_context():
+            import_file(venues_path, "venues", batch_size=2,
+                        progress=messages.append)
+            venue = Venue.query.filter_by(name="Venue 4").one()
+            self.assertEqual(venue.genres, ["Jazz", "Blues"])
+            self.assertTrue(venue.seeking_talent)
+
+            self.client.get("/shows")
+            with self.assertRaises(RecordError) as failure:
+                import_file(shows_path, "shows", batch_size=2,
+                            progress=messages.append)
+            # the first batch went in, so the cached listing was dropped
+            self.assertEqual(len(page_cache.backend.entries), 0)
+            self.assertEqual(failure.exception.number, 4)
+            self.assertEqual(Show.query.count(), 4 + 2)
+            self.assertEqual(ImportProgress.query.one().done, 2)
+
+            records[3]["venue"] = "Venue 3"
+            with open(shows_path, "w") as f:
+                f.write("\n".join(json.dumps(record) for record in records))
+            self.assertEqual(import_file(shows_path, "shows", batch_size=2,
+                                         progress=messages.append), 3)
+            self.assertIn("shows: resuming after 2 rows", messages)
+            self.assertEqual(Show.query.count(), 4 + 5)
+            self.assertEqual(ImportProgress.query.count(), 0)
+
+    def test_engine_options(self):
+        options = engine_options("postgresql:///fyyur", {
+            "DB_POOL_SIZE": "2", "DB_STATEMENT_TIMEOUT": "5000"})
+        self.assertEqual(options["pool_size"], 2)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(options["connect_args"],
+                         {"options": "-c statement_timeout=5000"})
+        options = engine_options("postgresql:///fyyur",
+                                 {"DB_PGBOUNCER": "true"})
+        self.assertEqual(options, {"poolclass": NullPool})
+        self.assertEqual(engine_options("sqlite://", {}), {})
+
+    def test_pool_metrics(self):
+        with self.app.app_context():
+            engine = db.get_engine()
+            with engine.connect():
+                metrics = pool_metrics(engine)
+        self.assertEqual(metrics["pool"], "MeteredQueuePool")
+        self.assertEqual(metrics["checked_out"], 1)
+        self.assertGreater(metrics["checkouts"], 0)
+
+    def test_single_engine(self):
+        self.client.get("/venues")
+        self.client.get(f"/artists/{self.artist_id}")
+        with self.app.app_context():
+            engine = db.get_engine()
+        self.assertIs(self.app.extensions["sqlalchemy"].db, db)
+        self.assertIs(self.app.extensions["migrate"].db, db)
+        engines = [obj for obj in gc.get_objects() if isinstance(obj, Engine)]
+        self.assertEqual(engines, [engine])
+
+    def test_not_found(self):
+        response = self.client.get("/nowhere")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn(b'href="/"', response.data)
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """EXPLAINs the queries behind the hot pages on a million shows and
+    fails if any of them scans the whole Show table."""
+
+    shows = 1000000
+
+    @classmethod
+    def setUpClass(cls):
+        app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql:///fyyur_test"
+        cls.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            db.session.execute(
+                'INSERT INTO "Venue" (name, city, state, genres) '
+                "SELECT 'Venue ' || i, 'City ' || i % 50, 'CA', "
+                "ARRAY['Jazz'] FROM generate_series(1, 2000) i"
+            )
+            db.session.execute(
+                'INSERT INTO "Artist" (name, city, state, genres) '
+                "SELECT 'Artist ' || i, 'City ' || i % 50, 'CA', "
+                "ARRAY['Jazz'] FROM generate_series(1, 5000) i"
+            )
+            db.session.execute(
+                'INSERT INTO "Show" (venue_id, artist_id, start_time) '
+                "SELECT 1 + i % 2000, 1 + i % 5000, "
+                "now() + (i % 100000 - 50000) * interval '20 minutes' "
+                "FROM generate_series(1, :shows) i",
+                {"shows": cls.shows},
+            )
+            db.session.commit()
+            db.session.execute('ANALYZE "Venue", "Artist", "Show"')
+
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def plans(self, url):
+        page_cache.clear()
+        with QueryCounter() as counter:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with app.app_context():
+            connection = db.session.connection()
+            for statement, parameters in zip(counter.statements,
+                                             counter.parameters):
+                rows = connection.execute("EXPLAIN " + statement, parameters)
+                plans.append("\n".join(row[0] for row in rows))
+        return plans
+
+    def assertNoShowSeqScan(self, url):
+        for plan in self.plans(url):
+            self.assertNotIn('Seq Scan on "Show"', plan, plan)
+
+    def test_venue_page_plan(self):
+        self.assertNoShowSeqScan("/venues/7")
+
+    def test_artist_page_plan(self):
+        self.assertNoShowSeqScan("/artists/7")
+
+    def test_venues_listing_plan(self):
+        self.assertNoShowSeqScan("/venues")
+        self.assertNoShowSeqScan("/venues?after=40")
+        for plan in self.plans("/venues"):
+            self.assertNotIn('Seq Scan on "Venue"', plan, plan)
+
+    def test_shows_listing_plan(self):
+        for url in ("/shows", "/shows?after=500000", "/shows?before=500000"):
+            for plan in self.plans(url):
+                self.assertNotIn('Seq Scan on "Show"', plan, plan)
+                self.assertNotIn("Hash Join", plan, plan)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+from collections import Counter
+
+from categories import categories
+from counts import add_to_count
+from models import db, Question
+from quiz import sampler
+from versions import bump
+
+"""
+Batch question writes
+
+    Core statements rather than one ORM object per question: a multi-row
+    INSERT per chunk of rows and a single DELETE for a list of ids. The ORM
+    events that keep question_counts, the quiz sampler and the questions
+    data version in step do not fire for these, so they are updated here.
+    Nothing is committed; the caller owns the transaction.
+"""
+
+CHUNK_SIZE = 1000
+FIELDS = ("question", "answer", "category", "difficulty")
+
+
+def validate_question(item):
+    """The column values for one posted question, or an error message."""
+    if not isinstance(item, dict):
+        return None, "must be an object"
+    unknown = set(item) - set(FIELDS)
+    if unknown:
+        return None, "unknown fields: " + ", ".join(sorted(unknown))
+    for field in ("question", "answer"):
+        if not isinstance(item.get(field), str) or not item[field].strip():
+            return None, field + " is required"
+    category = item.get("category")
+    if isinstance(category, str) and category.isdigit():
+        category = int(category)
+    if type(category) is not int or categories.type(category) is None:
+        return None, "unknown category"
+    difficulty = item.get("difficulty")
+    if type(difficulty) is not int or not 1 <= difficulty <= 5:
+        return None, "difficulty must be an integer from 1 to 5"
+    return {
+        "question": item["question"],
+        "answer": item["answer"],
+        "category": str(category),
+        "difficulty": difficulty,
+    }, None
+
+
+def insert_questions(rows):
+    """Insert rows (dicts of column values) and return their new ids, in
+    order."""
+    table = Question.__table__
+    connection = db.session.connection()
+    returning = db.engine.dialect.name == "postgresql"
+    ids = []
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        statement = table.insert().values(chunk)
+        if returning:
+            result = connection.execute(statement.returning(table.c.id))
+            ids.extend(id for id, in result)
+        else:
+            # SQLite numbers the rows of one INSERT consecutively
+            last = connection.execute(statement).lastrowid
+            ids.extend(range(last - len(chunk) + 1, last + 1))
+
+    added = {}
+    for row, id in zip(rows, ids):
+        added.setdefault(row["category"], []).append(id)
+    for category, category_ids in added.items():
+        add_to_count(connection, category, len(category_ids))
+        sampler.added(category, category_ids)
+    if ids:
+        bump(connection, "questions")
+    return ids
+
+
+def delete_questions(ids):
+    """Delete the questions with the given ids in one statement and return
+    the set of ids that existed."""
+    table = Question.__table__
+    connection = db.session.connection()
+    found = connection.execute(
+        table.select()
+        .with_only_columns([table.c.id, table.c.category])
+        .where(table.c.id.in_(ids))
+        .with_for_update()
+    ).fetchall()
+    if found:
+        connection.execute(
+            table.delete().where(table.c.id.in_([id for id, _ in found])))
+        bump(connection, "questions")
+    for category, count in Counter(
+            category for _, category in found).items():
+        add_to_count(connection, category, -count)
+    # the sampler drops deleted ids when it draws them
+    return {id for id, _ in found}
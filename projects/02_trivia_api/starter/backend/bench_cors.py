@@ -0,0 +1,82 @@
+"""Time the per-request cost of the CORS layer against flask_cors.
+
+    python bench_cors.py --count 20000
+
+Both apps serve one trivial route, so the difference between them is the
+CORS handling. Requests go straight to the WSGI callable.
+"""
+import argparse
+import time
+
+from flask import Flask, jsonify
+from werkzeug.test import EnvironBuilder
+
+from cors import CORS
+
+
+def add_cors_headers(response):
+    # api.py's hook before cors.py, on top of flask_cors
+    response.headers.add("Access-Control-Allow-Headers", 'Content-Type, Authorization')
+    response.headers.add("Access-Control-Allow-Methods", 'GET, POST, PATCH, DELETE, OPTIONS')
+    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    return response
+
+
+def make_app(cors):
+    app = Flask(__name__)
+
+    @app.route("/categories", methods=["GET", "POST"])
+    def categories():
+        return jsonify({"success": True})
+
+    if cors == "flask_cors":
+        import flask_cors
+
+        flask_cors.CORS(app, resources={r"*": {"origins": "*"}})
+        app.after_request(add_cors_headers)
+    else:
+        CORS(app)
+    return app
+
+
+def timed(app, environ, count):
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(count):
+        for _ in app(dict(environ), start_response):
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+
+    origin = {"Origin": "http://localhost:3000"}
+    requests = {
+        "GET": EnvironBuilder("/categories", headers=origin).get_environ(),
+        "preflight": EnvironBuilder(
+            "/categories", method="OPTIONS",
+            headers=dict(origin, **{
+                "Access-Control-Request-Method": "POST",
+                "Access-Control-Request-Headers": "Content-Type",
+            })).get_environ(),
+    }
+    apps = {name: make_app(name) for name in ("flask_cors", "cors.py")}
+
+    print("{} requests each".format(args.count))
+    for request, environ in requests.items():
+        baseline = timed(apps["flask_cors"], environ, args.count)
+        for name, app in apps.items():
+            elapsed = baseline if name == "flask_cors" else timed(
+                app, environ, args.count)
+            print("{:<10} {:<12} {:>8.1f}us/request  x{:.1f}".format(
+                request, name, elapsed / args.count * 10 ** 6,
+                baseline / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Load-test the trivia API through its WSGI app and record latencies.
+
+    createdb trivia_bench
+    python bench_load.py --questions 100000 --categories 20 \\
+        --concurrency 8 --requests 4000 --output results.json
+
+The tables of --database are dropped and reseeded from --seed on every run
+(unless --reuse), and each worker draws its requests from its own generator
+seeded from --seed, so two runs of the same commit issue the same requests
+against the same data. Compare the --output files of two commits to see
+what changed.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ENDPOINTS = ["questions", "search", "category", "quiz"]
+
+
+class StatementCounter:
+    """Counts the SQL statements each thread runs."""
+
+    def __init__(self):
+        self.local = threading.local()
+        event.listen(Engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, many):
+        self.local.count = getattr(self.local, "count", 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self.local, "count", 0)
+
+
+def seed(db, rng, words, questions, categories, batch_size=5000):
+    from counts import question_counter
+    from models import Category, Question
+    from search import search_index
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Category.__table__.insert().values(
+        [{"type": "Category {}".format(n + 1)} for n in range(categories)]))
+    category_ids = [id for id, in db.session.query(Category.id)]
+    table = Question.__table__
+    for start in range(0, questions, batch_size):
+        db.session.execute(table.insert().values([
+            {
+                "question": " ".join(rng.choices(words, k=rng.randint(6, 14)))
+                .capitalize() + "?",
+                "answer": " ".join(rng.choices(words, k=2)),
+                "category": str(rng.choice(category_ids)),
+                "difficulty": rng.randint(1, 5),
+            }
+            for _ in range(min(batch_size, questions - start))
+        ]))
+    db.session.commit()
+    search_index.install()
+    question_counter.rebuild()
+    return category_ids
+
+
+def request_for(rng, endpoint, args, words, category_ids):
+    """(method, url, json body) of one request to endpoint."""
+    pages = max(args.questions // 10, 1)
+    if endpoint == "questions":
+        return "GET", "/questions?page={}".format(rng.randint(1, pages)), None
+    if endpoint == "search":
+        return "POST", "/questions/search", {"searchTerm": rng.choice(words)}
+    if endpoint == "category":
+        category = rng.choice(category_ids)
+        per_category = max(args.questions // len(category_ids) // 10, 1)
+        return "GET", "/categories/{}/questions?page={}".format(
+            category, rng.randint(1, per_category)), None
+    category = rng.choice(category_ids)
+    return "POST", "/quizzes", {
+        "previous_questions": [rng.randint(1, args.questions)
+                               for _ in range(rng.randint(0, 5))],
+        "quiz_category": {"type": "Category {}".format(category),
+                          "id": category},
+    }
+
+
+def percentile(times, p):
+    if not times:
+        return None
+    ordered = sorted(times)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def summarize(times, statements, errors, elapsed=None):
+    summary = {
+        "requests": len(times),
+        "errors": errors,
+        "p50_ms": percentile(times, 50) * 1000 if times else None,
+        "p95_ms": percentile(times, 95) * 1000 if times else None,
+        "p99_ms": percentile(times, 99) * 1000 if times else None,
+        "mean_ms": sum(times) / len(times) * 1000 if times else None,
+        "statements_per_request":
+            sum(statements) / len(statements) if statements else None,
+    }
+    if elapsed:
+        summary["throughput_rps"] = len(times) / elapsed
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="postgresql:///trivia_bench")
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help="comma-separated subset of " + ", ".join(
+                            ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reuse", action="store_true",
+                        help="keep the data already in --database")
+    parser.add_argument("--output", help="write the results here as JSON")
+    args = parser.parse_args()
+    endpoints = args.endpoints.split(",")
+
+    # the app binds its database when models is first imported
+    os.environ["DATABASE_URL"] = args.database
+    from bench_search import vocabulary
+    from categories import categories
+    from models import db, Category
+    from quiz import sampler
+    from src.api import app
+
+    rng = random.Random(args.seed)
+    words = vocabulary(rng, 5000)
+    with app.app_context():
+        if args.reuse:
+            category_ids = [id for id, in db.session.query(Category.id)]
+        else:
+            print("seeding {} questions in {} categories".format(
+                args.questions, args.categories), file=sys.stderr)
+            category_ids = seed(db, rng, words, args.questions,
+                                args.categories)
+        categories.refresh()
+        sampler.invalidate()
+
+    counter = StatementCounter()
+    results = {name: ([], [], [0]) for name in endpoints}
+    lock = threading.Lock()
+
+    def worker(number, count, record):
+        worker_rng = random.Random("{}-{}".format(args.seed, number))
+        client = app.test_client()
+        for _ in range(count):
+            endpoint = worker_rng.choice(endpoints)
+            method, url, body = request_for(
+                worker_rng, endpoint, args, words, category_ids)
+            counter.reset()
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=body)
+            elapsed = time.perf_counter() - start
+            if record:
+                times, statements, errors = results[endpoint]
+                with lock:
+                    times.append(elapsed)
+                    statements.append(counter.count)
+                    if response.status_code >= 400:
+                        errors[0] += 1
+
+    def run(total, record):
+        per_worker = [total // args.concurrency] * args.concurrency
+        for n in range(total % args.concurrency):
+            per_worker[n] += 1
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            for future in [pool.submit(worker, n, count, record)
+                           for n, count in enumerate(per_worker)]:
+                future.result()
+
+    run(args.warmup, record=False)
+    start = time.perf_counter()
+    run(args.requests, record=True)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items()
+                   if key != "output"},
+        "endpoints": {
+            name: summarize(times, statements, errors[0])
+            for name, (times, statements, errors) in results.items()
+        },
+        "total": summarize(
+            [t for times, _, _ in results.values() for t in times],
+            [s for _, statements, _ in results.values() for s in statements],
+            sum(errors[0] for _, _, errors in results.values()),
+            elapsed,
+        ),
+    }
+
+    print("{:<10} {:>8} {:>6} {:>9} {:>9} {:>9} {:>6}".format(
+        "endpoint", "requests", "errors", "p50 ms", "p95 ms", "p99 ms",
+        "sql"))
+    for name, summary in list(report["endpoints"].items()) + [
+            ("total", report["total"])]:
+        if not summary["requests"]:
+            continue
+        print("{:<10} {:>8} {:>6} {:>9.2f} {:>9.2f} {:>9.2f} {:>6.1f}".format(
+            name, summary["requests"], summary["errors"], summary["p50_ms"],
+            summary["p95_ms"], summary["p99_ms"],
+            summary["statements_per_request"]))
+    print("{:.0f} requests/s at concurrency {}".format(
+        report["total"]["throughput_rps"], args.concurrency))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
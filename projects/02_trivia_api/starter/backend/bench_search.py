@@ -0,0 +1,103 @@
+"""Time question search on a synthetic corpus: LIKE against full text.
+
+    createdb trivia_bench
+    python bench_search.py --database postgresql:///trivia_bench --count 500000
+
+The corpus is generated from --seed and only inserted when the database has
+fewer than --count questions. --database sqlite:///bench.db runs the FTS5
+fallback instead.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from flask import Flask
+
+from counts import question_counter
+from models import setup_db, db, Question
+from search import search_index, search_questions
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "po",
+             "an", "el", "or", "ul", "is"]
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES)
+                          for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def seed(rng, words, count, batch_size=5000):
+    table = Question.__table__
+    have = Question.query.count()
+    # Zipf-ish: a few words are common, most are rare
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    for start in range(have, count, batch_size):
+        rows = []
+        for _ in range(min(batch_size, count - start)):
+            question = " ".join(rng.choices(words, weights, k=rng.randint(6, 14)))
+            rows.append({
+                "question": question.capitalize() + "?",
+                "answer": " ".join(rng.choices(words, weights, k=2)),
+                "category": str(rng.randint(1, 6)),
+                "difficulty": rng.randint(1, 5),
+            })
+        db.session.execute(table.insert().values(rows))
+        db.session.commit()
+        print("seeded {} questions".format(start + len(rows)))
+    if have < count:
+        question_counter.rebuild()
+
+
+def search_like(term, page=1, per_page=10):
+    # /questions/search as it was: an unindexed LIKE, every match returned
+    return Question.query.filter(Question.question.like(f"%{term}%")).all()
+
+
+def timed(search, terms):
+    times = []
+    for term in terms:
+        start = time.perf_counter()
+        search(term)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="postgresql:///trivia_bench")
+    parser.add_argument("--count", type=int, default=500000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = vocabulary(rng, 5000)
+    app = Flask(__name__)
+    setup_db(app, args.database)
+    with app.app_context():
+        seed(rng, words, args.count)
+        search_index.install()
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute("ANALYZE questions")
+            db.session.commit()
+        # common, middling and rare words
+        terms = [rng.choice(words[:20]) for _ in range(args.queries // 3)]
+        terms += [rng.choice(words[20:500]) for _ in range(args.queries // 3)]
+        terms += [rng.choice(words[500:]) for _ in range(args.queries // 3)]
+
+        print("{} questions, {} searches".format(args.count, len(terms)))
+        for name, search in [("LIKE, all rows", search_like),
+                             ("full text, page 1", search_questions)]:
+            times = timed(search, terms)
+            print("{:<20} mean {:>8.2f}ms  median {:>8.2f}ms  max {:>8.2f}ms"
+                  .format(name, statistics.mean(times) * 1000,
+                          statistics.median(times) * 1000,
+                          max(times) * 1000))
+
+
+if __name__ == "__main__":
+    main()
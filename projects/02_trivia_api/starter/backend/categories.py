@@ -0,0 +1,105 @@
+import itertools
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Category
+from versions import current_versions
+
+"""
+CategoryRegistry
+    the categories, held in memory so requests never query for them
+
+    refresh() loads the table into an id -> type and a type -> id dict and
+    bumps version. A commit of a session that wrote to Category through
+    the ORM (including a bulk Query.update or delete) calls invalidate(),
+    which makes the next lookup reload. So does a rollback of one, in case
+    a lookup in that transaction loaded its rows. Writes from other
+    processes are seen through sync(), which reloads when the categories
+    data version a request read differs from the one last loaded. Anything
+    that changes the table another way should call refresh() or
+    invalidate() itself.
+"""
+
+
+class CategoryRegistry:
+    def __init__(self):
+        self.by_id = {}
+        self.by_type = {}
+        self.version = 0
+        self.data_version = None
+        self.stale = True
+        self.generation = 0
+        self.lock = Lock()
+
+    def refresh(self):
+        generation = self.generation
+        # read first, so a write racing the query only makes it look older
+        data_version = current_versions(["categories"])["categories"]
+        by_id = {
+            category.id: category.type
+            for category in Category.query.order_by(Category.id)
+        }
+        with self.lock:
+            self.by_id = by_id
+            self.by_type = {type: id for id, type in by_id.items()}
+            self.version += 1
+            self.data_version = data_version
+            # a commit during the query may not be in it
+            self.stale = generation != self.generation
+
+    def invalidate(self):
+        self.generation += 1
+        self.stale = True
+
+    def sync(self, data_version):
+        if data_version != self.data_version:
+            self.invalidate()
+
+    def loaded(self):
+        if self.stale:
+            self.refresh()
+        return self
+
+    def types(self):
+        """Every category type, in id order."""
+        return list(self.loaded().by_id.values())
+
+    def type(self, id):
+        return self.loaded().by_id.get(id)
+
+    def id(self, type):
+        return self.loaded().by_type.get(type)
+
+
+categories = CategoryRegistry()
+
+
+@event.listens_for(Session, "after_flush")
+def categories_flushed(session, flush_context):
+    if any(
+        isinstance(instance, Category)
+        for instance in itertools.chain(session.new, session.dirty, session.deleted)
+    ):
+        session.info["categories_changed"] = True
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def categories_bulk_changed(context):
+    if context.mapper.class_ is Category:
+        context.session.info["categories_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def categories_committed(session):
+    if session.info.pop("categories_changed", False):
+        categories.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def categories_rolled_back(session):
+    # a lookup in the same transaction may have loaded the rolled back rows
+    if session.info.pop("categories_changed", False):
+        categories.invalidate()
@@ -0,0 +1,72 @@
+from flask import request
+
+"""
+CORS
+    cross-origin headers for every response, worked out once
+
+    The header values are fixed when the app starts, except for
+    Access-Control-Allow-Origin: an allowed Origin is echoed back (origins
+    "*" allows any), with Vary: Origin, so credentialed requests keep
+    working alongside Access-Control-Allow-Credentials. A preflight (an
+    OPTIONS request carrying Access-Control-Request-Method) is answered by
+    a WSGI middleware before Flask builds a request, routes it or runs any
+    hooks, and Access-Control-Max-Age lets the browser reuse the answer.
+    Other responses get the same headers set once in after_request.
+"""
+
+PREFLIGHT_STATUS = "204 No Content"
+
+
+class CORS:
+    def __init__(self, app=None, origins="*",
+                 methods=("GET", "POST", "PATCH", "DELETE", "OPTIONS"),
+                 headers=("Content-Type", "Authorization"), max_age=86400):
+        self.origins = origins if origins == "*" else frozenset(origins)
+        self.response_headers = [
+            ("Access-Control-Allow-Headers", ", ".join(headers)),
+            ("Access-Control-Allow-Methods", ", ".join(methods)),
+            ("Access-Control-Allow-Credentials", "true"),
+        ]
+        self.preflight_headers = self.response_headers + [
+            ("Vary", "Origin"),
+            ("Access-Control-Max-Age", str(max_age)),
+            ("Content-Length", "0"),
+        ]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.wsgi_app = PreflightMiddleware(app.wsgi_app, self)
+        app.after_request(self.add_headers)
+
+    def allow_origin(self, origin):
+        """The Access-Control-Allow-Origin header for origin, or None."""
+        if origin and (self.origins == "*" or origin in self.origins):
+            return ("Access-Control-Allow-Origin", origin)
+        return None
+
+    def add_headers(self, response):
+        for name, value in self.response_headers:
+            response.headers[name] = value
+        response.vary.add("Origin")
+        allow_origin = self.allow_origin(request.headers.get("Origin"))
+        if allow_origin is not None:
+            response.headers[allow_origin[0]] = allow_origin[1]
+        return response
+
+
+class PreflightMiddleware:
+    def __init__(self, wsgi_app, cors):
+        self.wsgi_app = wsgi_app
+        self.cors = cors
+
+    def __call__(self, environ, start_response):
+        if (environ["REQUEST_METHOD"] == "OPTIONS"
+                and "HTTP_ACCESS_CONTROL_REQUEST_METHOD" in environ):
+            headers = list(self.cors.preflight_headers)
+            allow_origin = self.cors.allow_origin(environ.get("HTTP_ORIGIN"))
+            if allow_origin is not None:
+                headers.append(allow_origin)
+            start_response(PREFLIGHT_STATUS, headers)
+            return [b""]
+        return self.wsgi_app(environ, start_response)
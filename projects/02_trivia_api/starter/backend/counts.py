@@ -0,0 +1,139 @@
+import os
+
+from sqlalchemy import Column, Integer, String, event, func, inspect, text
+
+from models import db, Question
+
+"""
+QuestionCount
+    the number of questions in each category, kept up to date in the same
+    transaction as every ORM insert, delete or category change of a
+    Question, so totals never need a count(*) over the questions table.
+    Questions without a category are counted under NO_CATEGORY.
+
+"""
+
+NO_CATEGORY = ""
+
+
+class QuestionCount(db.Model):
+    __tablename__ = "question_counts"
+
+    category = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+"""
+QuestionCounter
+    reads the counts
+
+    With approximate=True (QUESTION_COUNT=approximate in the environment)
+    the total on Postgres is the planner's estimate from pg_class, which
+    is free to read but only as fresh as the last VACUUM or ANALYZE.
+"""
+
+
+class QuestionCounter:
+    def __init__(self, approximate=False):
+        self.approximate = approximate
+
+    def sync(self):
+        """Fill question_counts from the questions table if it is empty,
+        e.g. after it was first created."""
+        if QuestionCount.query.first() is None:
+            self.rebuild()
+
+    def actual(self):
+        """{category: count} counted from the questions table."""
+        rows = (
+            db.session.query(Question.category, func.count(Question.id))
+            .group_by(Question.category)
+        )
+        return {count_key(category): count for category, count in rows}
+
+    def rebuild(self):
+        QuestionCount.query.delete()
+        db.session.bulk_insert_mappings(
+            QuestionCount,
+            [{"category": category, "count": count}
+             for category, count in self.actual().items()],
+        )
+        db.session.commit()
+
+    def reconcile(self):
+        """Correct the counts that have drifted from the questions table
+        and return {category: (stored, actual)} for each of them."""
+        stored = dict(db.session.query(QuestionCount.category,
+                                       QuestionCount.count))
+        actual = self.actual()
+        drifted = {
+            category: (stored.get(category, 0), actual.get(category, 0))
+            for category in set(stored) | set(actual)
+            if stored.get(category, 0) != actual.get(category, 0)
+        }
+        for category, (_, count) in drifted.items():
+            db.session.merge(QuestionCount(category=category, count=count))
+        db.session.commit()
+        return drifted
+
+    def total(self):
+        if self.approximate and db.engine.dialect.name == "postgresql":
+            estimate = db.session.execute(
+                text("SELECT reltuples::bigint FROM pg_class "
+                     "WHERE oid = 'questions'::regclass")
+            ).scalar()
+            # -1 until the table is first vacuumed or analyzed
+            if estimate is not None and estimate >= 0:
+                return estimate
+        return db.session.query(
+            func.coalesce(func.sum(QuestionCount.count), 0)).scalar()
+
+    def count(self, category):
+        count = (
+            db.session.query(QuestionCount.count)
+            .filter(QuestionCount.category == str(category))
+            .scalar()
+        )
+        return count or 0
+
+
+question_counter = QuestionCounter(
+    approximate=os.environ.get("QUESTION_COUNT", "exact") == "approximate")
+
+
+def count_key(category):
+    return NO_CATEGORY if category is None else str(category)
+
+
+# one statement, so two first inserts into a category cannot race
+# (Postgres and SQLite 3.24+ share this syntax)
+UPSERT = text(
+    "INSERT INTO question_counts (category, count) VALUES (:category, :count) "
+    "ON CONFLICT (category) "
+    "DO UPDATE SET count = question_counts.count + :delta"
+)
+
+
+def add_to_count(connection, category, delta):
+    connection.execute(UPSERT, category=count_key(category),
+                       count=max(delta, 0), delta=delta)
+
+
+@event.listens_for(Question, "after_insert")
+def question_inserted(mapper, connection, question):
+    add_to_count(connection, question.category, 1)
+
+
+@event.listens_for(Question, "after_delete")
+def question_deleted(mapper, connection, question):
+    add_to_count(connection, question.category, -1)
+
+
+@event.listens_for(Question, "after_update")
+def question_updated(mapper, connection, question):
+    history = inspect(question).attrs.category.history
+    if history.has_changes():
+        for category in history.deleted:
+            add_to_count(connection, category, -1)
+        for category in history.added:
+            add_to_count(connection, category, 1)
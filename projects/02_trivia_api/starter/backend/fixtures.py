@@ -0,0 +1,154 @@
+import os
+
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import scoped_session
+
+from categories import categories
+from counts import question_counter
+from models import db, Question, Category
+from quiz import sampler
+from search import search_index
+
+SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "trivia.psql")
+INTEGER_COLUMNS = ("id", "difficulty")
+
+"""
+read_seed(path)
+    the rows of every COPY block in a pg_dump file such as trivia.psql, as
+    {table: [row dict, ...]}, so the tests load the same data without psql
+"""
+
+
+def read_seed(path=SEED_PATH):
+    tables = {}
+    rows = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if rows is None:
+                if line.startswith("COPY "):
+                    name, columns = line[5:].split(" ", 1)
+                    columns = columns[1:columns.index(")")].split(", ")
+                    rows = tables.setdefault(name.split(".")[-1], [])
+                continue
+            if line == "\\.":
+                rows = None
+                continue
+            values = [None if value == "\\N" else value
+                      for value in line.split("\t")]
+            row = dict(zip(columns, values))
+            for column in INTEGER_COLUMNS:
+                if row.get(column) is not None:
+                    row[column] = int(row[column])
+            rows.append(row)
+    return tables
+
+
+"""
+create_schema()
+    drops and recreates the tables of the database the app is bound to
+    and loads the trivia.psql data into them
+
+    Only point the app at an in-memory SQLite database or a throwaway
+    Postgres one when calling this.
+"""
+
+
+def create_schema():
+    seed = read_seed()
+    db.session.remove()
+    if db.engine.dialect.name == "sqlite":
+        sqlite_savepoints(db.engine)
+        db.session.execute(text("DROP TABLE IF EXISTS questions_fts"))
+        db.session.commit()
+    db.drop_all()
+    db.create_all()
+    search_index.install()
+    db.session.execute(Category.__table__.insert(), seed["categories"])
+    db.session.execute(Question.__table__.insert(), seed["questions"])
+    if db.engine.dialect.name == "postgresql":
+        # the ids were given explicitly, so move the sequences past them
+        for model in (Category, Question):
+            db.session.execute(
+                text("SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+                     ":id)"),
+                {"table": model.__tablename__,
+                 "id": db.session.query(func.max(model.id)).scalar()},
+            )
+    db.session.commit()
+    question_counter.rebuild()
+    categories.refresh()
+    sampler.invalidate()
+
+
+"""
+RollbackFixture
+    runs everything the app does during a test inside a SAVEPOINT that is
+    rolled back afterwards
+
+    start() opens one connection, begins a transaction on it and points
+    db.session at sessions bound to that connection, each of which works
+    inside a SAVEPOINT that is reopened whenever the app commits or rolls
+    back. stop() rolls the whole transaction back and puts db.session back,
+    so every test sees the seed data as create_schema() left it.
+"""
+
+
+class RollbackFixture:
+    def __init__(self):
+        self.connection = None
+        self.transaction = None
+        self.app_session = None
+
+    def start(self):
+        self.connection = db.engine.connect()
+        self.transaction = self.connection.begin()
+        factory = db.create_session(
+            {"bind": self.connection, "binds": {}, "query_cls": db.Query})
+        event.listen(factory, "after_transaction_end", restart_savepoint)
+
+        def session():
+            session = factory()
+            session.begin_nested()
+            return session
+
+        self.app_session = db.session
+        db.session = scoped_session(
+            session, scopefunc=self.app_session.registry.scopefunc)
+
+    def stop(self):
+        db.session.remove()
+        db.session = self.app_session
+        # returning the connection to the pool rolls back the transaction
+        # begun in start(), and with it every SAVEPOINT the app opened
+        self.connection.close()
+        # forget anything cached from rows that were just rolled back
+        categories.invalidate()
+        sampler.invalidate()
+
+
+def restart_savepoint(session, transaction):
+    if transaction.nested and not transaction.parent.nested:
+        session.expire_all()
+        session.begin_nested()
+
+
+def sqlite_savepoints(engine):
+    # pysqlite issues its own BEGIN lazily and drops SAVEPOINTs across it;
+    # let SQLAlchemy emit BEGIN instead, as its SQLite docs describe
+    if getattr(engine, "sqlite_savepoints", False):
+        return
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        connection.execute("BEGIN")
+
+    # connections already in the pool predate the connect listener (for an
+    # in-memory database this discards it; create_schema() runs after)
+    engine.dispose()
+    engine.sqlite_savepoints = True
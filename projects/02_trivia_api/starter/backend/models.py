@@ -1,10 +1,12 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, Index, create_engine
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from pool import engine_options
+
 database_name = "trivia"
-database_path = "postgresql:///trivia"
+database_path = os.environ.get("DATABASE_URL", "postgresql:///trivia")
 
 db = SQLAlchemy()
 
@@ -17,6 +19,7 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
     db.create_all()
@@ -30,6 +33,7 @@ Question
 
 class Question(db.Model):
     __tablename__ = "questions"
+    __table_args__ = (Index("ix_questions_category_id", "category", "id"),)
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
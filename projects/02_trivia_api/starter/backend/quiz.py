@@ -0,0 +1,119 @@
+import random
+import time
+from array import array
+from threading import Lock, Thread
+
+from flask import current_app
+from sqlalchemy import event
+
+from models import db, Question
+
+"""
+QuestionSampler
+    picks a random question a player has not been asked yet
+
+    The ids of each category's questions (and of all questions, for the
+    "click" quiz) are kept in an array in memory, so a pick is a few random
+    draws checked against a set of the previous questions plus a single
+    primary key lookup, however many questions there are. Arrays are loaded
+    on first use and extended as this process inserts questions. After ttl
+    seconds, to see other processes' writes, an array is reloaded by a
+    background thread while requests keep drawing from the old one. A drawn
+    id whose row has been deleted is dropped from the arrays.
+"""
+
+
+class QuestionSampler:
+    def __init__(self, ttl=300, attempts=8):
+        self.ttl = ttl
+        self.attempts = attempts
+        self.arrays = {}
+        self.reloading = set()
+        self.lock = Lock()
+
+    def ids(self, category=None):
+        entry = self.arrays.get(category)
+        if entry is None:
+            return self.load(category)
+        if entry[1] < time.monotonic():
+            self.reload_later(category)
+        return entry[0]
+
+    def load(self, category):
+        query = db.session.query(Question.id)
+        if category is not None:
+            query = query.filter(Question.category == category)
+        ids = array("q", (id for id, in query))
+        with self.lock:
+            self.arrays[category] = (ids, time.monotonic() + self.ttl)
+        return ids
+
+    def reload_later(self, category):
+        with self.lock:
+            if category in self.reloading:
+                return
+            self.reloading.add(category)
+        app = current_app._get_current_object()
+
+        def reload():
+            try:
+                with app.app_context():
+                    self.load(category)
+            finally:
+                with self.lock:
+                    self.reloading.discard(category)
+
+        Thread(target=reload, name="quiz-reload", daemon=True).start()
+
+    def added(self, category, ids):
+        with self.lock:
+            for key in (None, str(category)):
+                if key in self.arrays:
+                    self.arrays[key][0].extend(ids)
+
+    def discard(self, id):
+        with self.lock:
+            for ids, _ in self.arrays.values():
+                if id in ids:
+                    ids.remove(id)
+
+    def invalidate(self, category=None):
+        with self.lock:
+            if category is None:
+                self.arrays.clear()
+            else:
+                self.arrays.pop(category, None)
+                self.arrays.pop(None, None)
+
+    def pick(self, category=None, previous=()):
+        """A random Question of category (any category if None) whose id
+        is not in previous, or None once every question has been asked."""
+        ids = self.ids(category)
+        previous = set(previous or ())
+        for _ in range(self.attempts):
+            if not ids:
+                return None
+            id = random.choice(ids)
+            if id in previous:
+                continue
+            question = Question.query.get(id)
+            if question is not None:
+                return question
+            # deleted by another process since the array was loaded
+            self.discard(id)
+        # the player has seen most of the category; choose from what is left
+        remaining = [id for id in ids if id not in previous]
+        while remaining:
+            id = remaining.pop(random.randrange(len(remaining)))
+            question = Question.query.get(id)
+            if question is not None:
+                return question
+        return None
+
+
+sampler = QuestionSampler()
+
+
+@event.listens_for(Question, "after_insert")
+def question_inserted(mapper, connection, question):
+    sampler.added(question.category, [question.id])
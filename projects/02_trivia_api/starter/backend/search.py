@@ -0,0 +1,151 @@
+from sqlalchemy import column, func, literal_column, table, text
+
+from counts import question_counter
+from models import db, Question
+
+"""
+Full-text search over question and answer text
+
+    Postgres keeps a tsvector of both columns in a stored generated column,
+    search_vector, with a GIN index on it, and ranks matches with ts_rank.
+    Storing the vector rather than indexing the expression means ranking
+    a common word's many matches does not re-parse every one of them.
+    SQLite has no tsvector, so there an external-content FTS5 table kept
+    in step by triggers does the matching and bm25 the ranking.
+
+    Adding the column rewrites the questions table under an exclusive lock,
+    so on Postgres the index is only built by `flask install-search`, never
+    when a worker starts. Until then searches compute the same tsvector
+    per row, without an index.
+"""
+
+SEARCH_DOCUMENT = (
+    "to_tsvector('english', coalesce(question, '') || ' ' || "
+    "coalesce(answer, ''))"
+)
+
+POSTGRES_STATE = (
+    "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+    "WHERE table_schema = current_schema() AND table_name = 'questions' "
+    "AND column_name = 'search_vector'), "
+    "(SELECT indisvalid FROM pg_index "
+    "WHERE indexrelid = to_regclass('ix_questions_search'))"
+)
+POSTGRES_ADD_COLUMN = (
+    "ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (" + SEARCH_DOCUMENT + ") STORED"
+)
+# left behind, invalid, by a concurrent build that failed
+POSTGRES_DROP_INDEX = "DROP INDEX CONCURRENTLY IF EXISTS ix_questions_search"
+POSTGRES_CREATE_INDEX = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_questions_search "
+    "ON questions USING gin (search_vector)"
+)
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE questions_fts USING fts5("
+    "question, answer, content='questions', content_rowid='id')",
+    "CREATE TRIGGER questions_fts_insert AFTER INSERT ON questions BEGIN "
+    "INSERT INTO questions_fts (rowid, question, answer) "
+    "VALUES (new.id, new.question, new.answer); END",
+    "CREATE TRIGGER questions_fts_delete AFTER DELETE ON questions BEGIN "
+    "INSERT INTO questions_fts (questions_fts, rowid, question, answer) "
+    "VALUES ('delete', old.id, old.question, old.answer); END",
+    "CREATE TRIGGER questions_fts_update AFTER UPDATE ON questions BEGIN "
+    "INSERT INTO questions_fts (questions_fts, rowid, question, answer) "
+    "VALUES ('delete', old.id, old.question, old.answer); "
+    "INSERT INTO questions_fts (rowid, question, answer) "
+    "VALUES (new.id, new.question, new.answer); END",
+    "INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')",
+]
+
+questions_fts = table("questions_fts", column("rowid"), column("rank"))
+
+
+"""
+SearchIndex
+    whether the database has the search index, as last checked
+
+    check() only reads the catalogs, so it is safe to run as every worker
+    starts; install() creates whatever is missing.
+"""
+
+
+class SearchIndex:
+    def __init__(self):
+        self.installed = False
+
+    def state(self):
+        """(column or table exists, index valid or None if missing)"""
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            return tuple(db.session.execute(text(POSTGRES_STATE)).first())
+        if dialect == "sqlite":
+            exists = bool(db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'")
+            ).scalar())
+            return exists, exists or None
+        return False, None
+
+    def check(self):
+        self.installed = self.state() == (True, True)
+        db.session.commit()
+        return self.installed
+
+    def install(self):
+        """Create the search index if the database does not have it yet."""
+        exists, valid = self.state()
+        db.session.commit()
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql" and not (exists and valid):
+            # CONCURRENTLY cannot run inside a transaction
+            engine = db.engine.execution_options(isolation_level="AUTOCOMMIT")
+            with engine.connect() as connection:
+                if not exists:
+                    connection.execute(text(POSTGRES_ADD_COLUMN))
+                if valid is False:
+                    connection.execute(text(POSTGRES_DROP_INDEX))
+                connection.execute(text(POSTGRES_CREATE_INDEX))
+        elif dialect == "sqlite" and not exists:
+            for statement in SQLITE_DDL:
+                db.session.execute(text(statement))
+            db.session.commit()
+        return self.check()
+
+
+search_index = SearchIndex()
+
+
+def fts5_query(term):
+    # every word as a quoted string, so FTS5 operators in the term are
+    # searched for rather than interpreted
+    return " ".join('"{}"'.format(word.replace('"', '""'))
+                    for word in term.split())
+
+
+def search_questions(term, page=1, per_page=10):
+    """The page-th page of questions matching term, best match first, and
+    the number of matches. A blank term matches every question."""
+    query = Question.query
+    if not term or not term.strip():
+        questions = query.order_by(Question.id)
+        questions = questions.offset((max(page, 1) - 1) * per_page)
+        return questions.limit(per_page).all(), question_counter.total()
+    if db.engine.dialect.name == "sqlite":
+        query = (
+            query.join(questions_fts, questions_fts.c.rowid == Question.id)
+            .filter(text("questions_fts MATCH :match"))
+            .params(match=fts5_query(term))
+            .order_by(questions_fts.c.rank, Question.id)
+        )
+    else:
+        vector = literal_column(
+            "questions.search_vector" if search_index.installed
+            else SEARCH_DOCUMENT)
+        tsquery = func.websearch_to_tsquery("english", term)
+        query = query.filter(vector.op("@@")(tsquery)).order_by(
+            func.ts_rank(vector, tsquery).desc(), Question.id
+        )
+    total = query.order_by(None).count()
+    questions = query.offset((max(page, 1) - 1) * per_page).limit(per_page)
+    return questions.all(), total
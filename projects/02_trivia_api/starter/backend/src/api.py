@@ -1,56 +1,108 @@
 import json
-from flask import Flask, request, abort, jsonify
-from flask_cors import CORS
-import random
+from flask import (Flask, Response, request, abort, g, jsonify,
+                   stream_with_context)
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question
+from batch import delete_questions, insert_questions, validate_question
+from categories import categories
+from cors import CORS
+from counts import question_counter
+from quiz import sampler
+from search import search_index, search_questions
+from versions import current_versions, etag
 
 QUESTIONS_PER_PAGE = 10
+MAX_QUESTIONS_PER_PAGE = 100
+STREAM_BATCH_SIZE = 1000
+
+# GET routes answered with 304 Not Modified while the client's ETag is
+# current: endpoint -> (tables the body is built from, Cache-Control)
+CONDITIONAL_ROUTES = {
+    "get_categories": (("categories",), "public, max-age=300"),
+    "get_questions": (("questions", "categories"), "no-cache"),
+    "get_questions_by_category": (("questions", "categories"), "no-cache"),
+}
 
 app = Flask(__name__)
 setup_db(app)
-CORS(app, resources={r"*": {"origins": "*"}})
+with app.app_context():
+    categories.refresh()
+    question_counter.sync()
+    # the Postgres index is built by flask install-search, not here
+    if db.engine.dialect.name == "sqlite":
+        search_index.install()
+    else:
+        search_index.check()
+CORS(app)
+
+
+@app.cli.command("reconcile-counts")
+def reconcile_counts():
+    """Correct question_counts where it has drifted from the questions."""
+    drifted = question_counter.reconcile()
+    for category, (stored, actual) in sorted(drifted.items()):
+        print("category {!r}: {} -> {}".format(category, stored, actual))
+    print("{} counts corrected".format(len(drifted)))
+
+
+@app.cli.command("install-search")
+def install_search():
+    """Add the full-text search column and index to the questions table."""
+    search_index.install()
+    print("search index installed")
 
 # ROUTES
 
 
+@app.before_request
+def check_etag():
+    route = CONDITIONAL_ROUTES.get(request.endpoint)
+    if route is None or request.method != "GET":
+        return None
+    # taken before the view runs, so a write racing it can only make the
+    # tag older than the body, never newer
+    versions = current_versions(route[0])
+    if "categories" in versions:
+        # another process may have written them since the registry loaded
+        categories.sync(versions["categories"])
+    g.etag = etag(versions)
+    if request.if_none_match.contains(g.etag):
+        return Response(status=304)
+
+
 @app.after_request
-def add_cors_headers(response):
-    # response.headers.add("Access-Control-Allow-Origin", "*")
-    response.headers.add("Access-Control-Allow-Headers", 'Content-Type, Authorization')
-    response.headers.add("Access-Control-Allow-Methods", 'GET, POST, PATCH, DELETE, OPTIONS')
-    response.headers.add('Access-Control-Allow-Credentials', 'true')
+def add_cache_headers(response):
+    route = CONDITIONAL_ROUTES.get(request.endpoint)
+    if route is not None and "etag" in g and response.status_code in (200, 304):
+        response.set_etag(g.etag)
+        response.headers["Cache-Control"] = route[1]
     return response
 
 
 @app.route("/categories", methods=["GET"])
 def get_categories():
-    response = Category.query.all()
-    categories = []
-    for category in response:
-        categories.append(category.type)
-    return jsonify({"success": True, "categories": categories})
+    return jsonify({"success": True, "categories": categories.types()})
 
 
 @app.route("/questions", methods=["GET"])
 def get_questions(page=1):
     page = int(request.args.get("page")) if request.args.get("page") else 1
-    per_page = 10
-    max_per_page = 10
-    error_out = False
-    response = Question.query.paginate(page, per_page, error_out, max_per_page)
+    response = (
+        Question.query.order_by(Question.id)
+        .offset((max(page, 1) - 1) * QUESTIONS_PER_PAGE)
+        .limit(QUESTIONS_PER_PAGE)
+    )
     questions = []
-    categories = [each.type for each in Category.query.all()]
     current_category = []
-    for question in response.items:
+    for question in response:
         questions.append(question.format())
-    total_questions = Question.query.count()
+    total_questions = question_counter.total()
     return jsonify(
         {
             "questions": questions,
             "totalQuestions": total_questions,
             "currentCategory": current_category,
-            "categories": categories,
+            "categories": categories.types(),
         }
     )
 
@@ -71,7 +123,7 @@ def create_question():
     data = request.json
     question = Question(**data)
     result = question.insert()
-    total_questions = Question.query.count()
+    total_questions = question_counter.total()
     return jsonify(
         {"success": True,
          "insert":result.id,
@@ -80,13 +132,104 @@ def create_question():
     )
 
 
+@app.route("/questions/batch", methods=["POST"])
+def create_questions():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400)
+    items = data.get("questions")
+    if not isinstance(items, list) or not items:
+        abort(400)
+    # with partial, valid questions are inserted even if others are not
+    partial = bool(data.get("partial"))
+    results = []
+    rows = []
+    for index, item in enumerate(items):
+        row, error = validate_question(item)
+        if error:
+            results.append({"index": index, "error": error})
+        else:
+            results.append({"index": index})
+            rows.append(row)
+    failed = len(rows) < len(items)
+    if failed and not partial:
+        return jsonify({"success": False, "error": 422,
+                        "message": "Unprocessable Entity",
+                        "results": results}), 422
+    try:
+        ids = iter(insert_questions(rows))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    for result in results:
+        if "error" not in result:
+            result["id"] = next(ids)
+    return jsonify(
+        {
+            "success": not failed,
+            "inserted": len(rows),
+            "results": results,
+            "totalQuestions": question_counter.total(),
+        }
+    )
+
+
+@app.route("/questions/batch", methods=["DELETE"])
+def delete_questions_batch():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400)
+    ids = data.get("ids")
+    if (not isinstance(ids, list) or not ids
+            or not all(type(id) is int for id in ids)):
+        abort(400)
+    partial = bool(data.get("partial"))
+    try:
+        found = delete_questions(ids)
+        missing = [id for id in ids if id not in found]
+        committed = partial or not missing
+        if committed:
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except Exception:
+        db.session.rollback()
+        raise
+    results = [
+        {"id": id, "deleted": committed} if id in found
+        else {"id": id, "error": "not found"}
+        for id in ids
+    ]
+    if not committed:
+        return jsonify({"success": False, "error": 404,
+                        "message": "Resource Not Found",
+                        "results": results}), 404
+    return jsonify(
+        {
+            "success": not missing,
+            "deleted": len(found),
+            "results": results,
+            "totalQuestions": question_counter.total(),
+        }
+    )
+
+
 @app.route("/questions/search", methods=["POST"])
 def search_question():
     data = json.loads(request.data)
-    response = Question.query.filter(
-        Question.question.like(f"%{data.get('searchTerm')}%")
-    ).all()
-    total_questions = len(response)
+    page = data.get("page")
+    if page is None:
+        page = request.args.get("page", 1)
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        abort(400)
+    if page < 1:
+        abort(400)
+    response, total_questions = search_questions(
+        data.get("searchTerm"), page, QUESTIONS_PER_PAGE
+    )
     questions = []
     current_category = set()
     for question in response:
@@ -103,41 +246,66 @@ def search_question():
 
 @app.route("/categories/<int:category_id>/questions", methods=["GET"])
 def get_questions_by_category(category_id):
-    response = Question.query.filter_by(category=str(category_id)).all()
-    total_questions = len(response)
-    questions = []
-    current_category = None
-    for question in response:
-        questions.append(question.format())
-        current_category = question.category
+    if categories.type(category_id) is None:
+        abort(404)
+    query = Question.query.filter_by(category=str(category_id)).order_by(
+        Question.id
+    )
+    # keyset cursor: the id of the last question already seen
+    after = request.args.get("after", type=int)
+    if after is not None:
+        query = query.filter(Question.id > after)
+
+    if request.args.get("format") == "jsonl":
+        # one question per line, read through a server-side cursor so the
+        # category is never held in memory at once
+        def stream():
+            for question in query.yield_per(STREAM_BATCH_SIZE):
+                yield json.dumps(question.format()) + "\n"
+
+        return Response(
+            stream_with_context(stream()), mimetype="application/x-ndjson"
+        )
+
+    page = request.args.get("page", 1, type=int)
+    limit = min(
+        request.args.get("limit", QUESTIONS_PER_PAGE, type=int),
+        MAX_QUESTIONS_PER_PAGE,
+    )
+    if limit < 1:
+        abort(400)
+    if after is None:
+        query = query.offset((max(page, 1) - 1) * limit)
+    questions = [question.format() for question in query.limit(limit)]
     return jsonify(
         {
             "questions": questions,
-            "totalQuestions": total_questions,
-            "currentCategory": current_category,
+            "totalQuestions": question_counter.count(category_id),
+            "currentCategory": category_id,
+            "nextCursor": questions[-1]["id"]
+            if len(questions) == limit else None,
         }
     )
 
 
 @app.route("/quizzes", methods=["POST"])
 def quiz_question():
-    data = json.loads(request.data)
-    quiz_category = data.get("quiz_category")
-    previous_questions = data.get("previous_questions")
-    category_id = quiz_category.get("type")
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(
+            data.get("quiz_category"), dict):
+        abort(400)
+    previous_questions = data.get("previous_questions") or []
+    if not isinstance(previous_questions, list):
+        abort(400)
+    category_id = data["quiz_category"].get("type")
     if category_id != "click":
-        category = Category.query.filter_by(type=category_id).one_or_none().id
-        questions = Question.query.filter_by(category=category).all()
+        category = categories.id(category_id)
+        if category is None:
+            abort(404)
+        question = sampler.pick(str(category), previous_questions)
     else:
-        questions = Question.query.all()
-    questions = list(
-        filter(
-            lambda question: question.id not in previous_questions, questions
-        )
-    )
-    return jsonify(
-        {"question": random.choice(questions).format() if questions else None}
-    )
+        question = sampler.pick(None, previous_questions)
+    return jsonify({"question": question.format() if question else None})
 
 
 # Error Handling
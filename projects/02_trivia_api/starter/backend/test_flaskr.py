@@ -1,37 +1,60 @@
+import os
+import time
 import unittest
 import json
 
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-from models import setup_db, Question
+# in-memory SQLite unless a throwaway Postgres database is given, e.g.
+# TEST_DATABASE_URL=postgresql:///trivia_test; its tables are recreated
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL", "sqlite://")
+
+from models import db, Question, Category
+from categories import categories
+from counts import add_to_count, question_counter
+from fixtures import RollbackFixture, create_schema
+from quiz import QuestionSampler
+from search import search_index
+from versions import bump, current_versions
 from src.api import app
 
 
+class QueryCounter:
+    """Records the SQL statements run while it is active."""
+
+    def __init__(self):
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, many):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(Engine, "before_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, "before_cursor_execute", self.record)
+
+
 class TriviaTestCase(unittest.TestCase):
     """This class represents the trivia test case"""
 
+    @classmethod
+    def setUpClass(cls):
+        """Build the schema and load the seed data once."""
+        with app.app_context():
+            create_schema()
+
     def setUp(self):
-        """Define test variables and initialize app."""
+        """Define test variables and start a transaction to roll back."""
         self.app = app
         self.client = app.test_client()
-        self.database_name = "trivia_test"
-        self.database_path = "postgresql:///trivia_test"
-        setup_db(self.app, self.database_path)
-
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables
-            self.db.create_all()
+        self.fixture = RollbackFixture()
+        self.fixture.start()
 
     def tearDown(self):
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables
-            self.db.drop_all()
+        self.fixture.stop()
 
     def test_get_questions(self):
         response = self.client.get("/questions", follow_redirects=True)
@@ -103,6 +126,451 @@ class TriviaTestCase(unittest.TestCase):
             not in previous_questions
         )
 
+    def test_quiz_question_by_category(self):
+        ids = [question.id for question in
+               Question.query.filter_by(category="1").all()]
+        headers = {"Content-Type": "application/json"}
+        data = {
+            "previous_questions": ids[1:],
+            "quiz_category": {"type": "Science", "id": 1},
+        }
+        response = self.client.post(
+            "/quizzes", data=json.dumps(data), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.data).get("question").get("id"), ids[0])
+
+        data["previous_questions"] = ids
+        response = self.client.post(
+            "/quizzes", data=json.dumps(data), headers=headers)
+        self.assertIsNone(json.loads(response.data).get("question"))
+
+    def test_quiz_question_sees_new_questions(self):
+        previous_questions = [question.id for question in
+                              Question.query.filter_by(category="6").all()]
+        data = {
+            "previous_questions": previous_questions,
+            "quiz_category": {"type": "Sports", "id": 6},
+        }
+        headers = {"Content-Type": "application/json"}
+        self.client.post("/quizzes", data=json.dumps(data), headers=headers)
+        with self.app.app_context():
+            question = Question("Who won the 2018 World Cup?", "France",
+                                "6", 1).insert()
+            question_id = question.id
+        response = self.client.post(
+            "/quizzes", data=json.dumps(data), headers=headers)
+        self.assertEqual(
+            json.loads(response.data).get("question").get("id"), question_id)
+        with self.app.app_context():
+            Question.query.get(question_id).delete()
+
+    def test_question_counts_reconcile(self):
+        with self.app.app_context():
+            total = question_counter.total()
+            connection = db.session.connection()
+            add_to_count(connection, "99", 1)
+            add_to_count(connection, "99", 1)
+            self.assertEqual(question_counter.count(99), 2)
+            self.assertEqual(question_counter.reconcile(), {"99": (2, 0)})
+            self.assertEqual(question_counter.total(), total)
+
+            # counted like the baseline count(*) did
+            Question("Uncategorised?", "Yes", None, 1).insert()
+            self.assertEqual(question_counter.total(), total + 1)
+
+            science = question_counter.count(1)
+            db.session.execute(
+                "UPDATE question_counts SET count = count + 5 "
+                "WHERE category = '1'")
+            self.assertEqual(question_counter.reconcile(),
+                             {"1": (science + 5, science)})
+            self.assertEqual(question_counter.count(1), science)
+            self.assertEqual(question_counter.total(), total + 1)
+
+    def test_quiz_rejects_malformed_bodies(self):
+        headers = {"Content-Type": "application/json"}
+        for body in ([], "x", {"previous_questions": []},
+                     {"quiz_category": {"type": "click"},
+                      "previous_questions": "1,2"}):
+            response = self.client.post(
+                "/quizzes", data=json.dumps(body), headers=headers)
+            self.assertEqual(response.status_code, 400, body)
+        response = self.client.post("/quizzes", data=json.dumps({
+            "quiz_category": {"type": "click"},
+            "previous_questions": None,
+        }), headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_quiz_sampler_reloads_in_background(self):
+        sampler = QuestionSampler(ttl=0)
+        with self.app.app_context():
+            ids = sampler.ids("1")
+            # past the ttl the old array is served while a thread reloads it
+            self.assertIs(sampler.ids("1"), ids)
+            for _ in range(100):
+                if sampler.arrays["1"][0] is not ids:
+                    break
+                time.sleep(0.01)
+            self.assertIsNot(sampler.arrays["1"][0], ids)
+            self.assertEqual(list(sampler.arrays["1"][0]), list(ids))
+
+    def test_categories_are_not_queried(self):
+        data = {
+            "previous_questions": [],
+            "quiz_category": {"type": "Art", "id": 2},
+        }
+        headers = {"Content-Type": "application/json"}
+        # the fixture forgets the categories after every test
+        with self.app.app_context():
+            categories.loaded()
+        with QueryCounter() as queries:
+            self.client.get("/categories")
+            self.client.get("/questions")
+            self.client.post(
+                "/quizzes", data=json.dumps(data), headers=headers)
+        self.assertFalse(
+            [sql for sql in queries.statements if "FROM categories" in sql])
+
+    def test_new_category_is_listed(self):
+        with self.app.app_context():
+            category = Category("Music")
+            db.session.add(category)
+            db.session.commit()
+            response = self.client.get("/categories")
+            self.assertIn("Music", json.loads(response.data)["categories"])
+            db.session.delete(category)
+            db.session.commit()
+        response = self.client.get("/categories")
+        self.assertNotIn("Music", json.loads(response.data)["categories"])
+
+    def test_uncommitted_category_is_not_listed(self):
+        with self.app.app_context():
+            db.session.add(Category("Phantom"))
+            db.session.flush()
+            categories.types()
+            db.session.rollback()
+        response = self.client.get("/categories")
+        self.assertNotIn("Phantom", json.loads(response.data)["categories"])
+
+    def test_commit_during_category_load(self):
+        def commit(conn, cursor, statement, *args):
+            if "FROM categories" in statement:
+                categories.invalidate()
+
+        event.listen(Engine, "before_cursor_execute", commit)
+        try:
+            with self.app.app_context():
+                categories.refresh()
+        finally:
+            event.remove(Engine, "before_cursor_execute", commit)
+        # the load may have missed the commit, so the next lookup reloads
+        self.assertTrue(categories.stale)
+
+    def test_question_counts(self):
+        headers = {"Content-Type": "application/json"}
+        total = json.loads(self.client.get("/questions").data)["totalQuestions"]
+        with self.app.app_context():
+            self.assertEqual(total, Question.query.count())
+            science = question_counter.count(1)
+        data = {
+            "question": "What is the chemical symbol for gold?",
+            "answer": "Au",
+            "category": 1,
+            "difficulty": 2,
+        }
+        with QueryCounter() as queries:
+            response = self.client.post(
+                "/questions", data=json.dumps(data), headers=headers)
+        self.assertFalse(
+            [sql for sql in queries.statements if "count(" in sql.lower()])
+        question_id = json.loads(response.data)["insert"]
+        self.assertEqual(
+            json.loads(response.data)["totalQuestions"], total + 1)
+        with self.app.app_context():
+            self.assertEqual(question_counter.count(1), science + 1)
+        self.client.delete(f"/questions/{question_id}")
+        total_after = json.loads(
+            self.client.get("/questions").data)["totalQuestions"]
+        self.assertEqual(total_after, total)
+
+    def test_search_index_is_installed_once(self):
+        with self.app.app_context():
+            with QueryCounter() as queries:
+                self.assertTrue(search_index.install())
+        self.assertFalse([sql for sql in queries.statements
+                          if sql.startswith(("ALTER", "CREATE", "DROP"))])
+
+        # before flask install-search, Postgres searches without the index
+        search_index.installed = False
+        try:
+            response = self.client.post(
+                "/questions/search",
+                data=json.dumps({"searchTerm": "SOCCER cup"}),
+                headers={"Content-Type": "application/json"},
+            )
+        finally:
+            search_index.installed = True
+        self.assertEqual(len(json.loads(response.data)["questions"]), 2)
+
+    def test_search_question_full_text(self):
+        headers = {"Content-Type": "application/json"}
+        response = self.client.post(
+            "/questions/search",
+            data=json.dumps({"searchTerm": "SOCCER cup"}),
+            headers=headers,
+        )
+        questions = json.loads(response.data)["questions"]
+        self.assertEqual(len(questions), 2)
+        self.assertTrue(all("soccer" in q["question"] for q in questions))
+
+        # answers are searched too
+        response = self.client.post(
+            "/questions/search",
+            data=json.dumps({"searchTerm": "agra"}),
+            headers=headers,
+        )
+        questions = json.loads(response.data)["questions"]
+        self.assertEqual([q["answer"] for q in questions], ["Agra"])
+
+    def test_search_question_pagination(self):
+        headers = {"Content-Type": "application/json"}
+        response = self.client.post(
+            "/questions/search",
+            data=json.dumps({"searchTerm": "", "page": 2}),
+            headers=headers,
+        )
+        data = json.loads(response.data)
+        with self.app.app_context():
+            total = Question.query.count()
+        self.assertEqual(data["totalQuestions"], total)
+        self.assertEqual(len(data["questions"]), min(total - 10, 10))
+
+        for page in ("abc", {}, [], 0, -1):
+            response = self.client.post(
+                "/questions/search",
+                data=json.dumps({"searchTerm": "", "page": page}),
+                headers=headers,
+            )
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/questions/search?page=abc",
+            data=json.dumps({"searchTerm": ""}),
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_questions_by_category(self):
+        with self.app.app_context():
+            ids = [question.id for question in Question.query.filter_by(
+                category="3").order_by(Question.id)]
+        response = self.client.get("/categories/3/questions?limit=2")
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q["id"] for q in data["questions"]], ids[:2])
+        self.assertEqual(data["totalQuestions"], len(ids))
+        self.assertEqual(data["currentCategory"], 3)
+
+        response = self.client.get(
+            f"/categories/3/questions?limit=2&after={data['nextCursor']}")
+        data = json.loads(response.data)
+        self.assertEqual([q["id"] for q in data["questions"]], ids[2:4])
+
+        response = self.client.get("/categories/3/questions?limit=2&page=2")
+        data = json.loads(response.data)
+        self.assertEqual([q["id"] for q in data["questions"]], ids[2:4])
+
+        response = self.client.get("/categories/1000/questions")
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_questions_by_category(self):
+        with self.app.app_context():
+            ids = [question.id for question in Question.query.filter_by(
+                category="4").order_by(Question.id)]
+        response = self.client.get("/categories/4/questions?format=jsonl")
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], ids)
+
+    def test_create_questions_batch(self):
+        headers = {"Content-Type": "application/json"}
+        with self.app.app_context():
+            total = Question.query.count()
+        items = [
+            {"question": f"Batch question {n}?", "answer": str(n),
+             "category": 2, "difficulty": 1}
+            for n in range(3)
+        ]
+        invalid = {"question": "No answer?", "category": 2, "difficulty": 1}
+        response = self.client.post(
+            "/questions/batch",
+            data=json.dumps({"questions": items + [invalid]}),
+            headers=headers,
+        )
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(data["results"][3]["error"], "answer is required")
+        with self.app.app_context():
+            self.assertEqual(Question.query.count(), total)
+
+        with QueryCounter() as queries:
+            response = self.client.post(
+                "/questions/batch",
+                data=json.dumps({"questions": items + [invalid],
+                                 "partial": True}),
+                headers=headers,
+            )
+        inserts = [sql for sql in queries.statements
+                   if sql.startswith("INSERT INTO questions")]
+        self.assertEqual(len(inserts), 1)
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(data["success"])
+        self.assertEqual(data["inserted"], 3)
+        self.assertEqual(data["totalQuestions"], total + 3)
+        ids = [result["id"] for result in data["results"][:3]]
+        with self.app.app_context():
+            self.assertEqual(
+                [Question.query.get(id).question for id in ids],
+                [item["question"] for item in items])
+
+        response = self.client.delete(
+            "/questions/batch",
+            data=json.dumps({"ids": ids + [100000]}),
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 404)
+        with QueryCounter() as queries:
+            response = self.client.delete(
+                "/questions/batch",
+                data=json.dumps({"ids": ids + [100000], "partial": True}),
+                headers=headers,
+            )
+        deletes = [sql for sql in queries.statements
+                   if sql.startswith("DELETE FROM questions")]
+        self.assertEqual(len(deletes), 1)
+        data = json.loads(response.data)
+        self.assertEqual(data["deleted"], 3)
+        self.assertEqual(data["results"][3]["error"], "not found")
+        self.assertEqual(data["totalQuestions"], total)
+
+    def test_batch_rejects_malformed_bodies(self):
+        headers = {"Content-Type": "application/json"}
+        for method in (self.client.post, self.client.delete):
+            for body in ([], "x", 1, None):
+                response = method("/questions/batch", data=json.dumps(body),
+                                  headers=headers)
+                self.assertEqual(response.status_code, 400)
+        response = self.client.delete(
+            "/questions/batch", data=json.dumps({"ids": [True]}),
+            headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+        item = {"question": "Bool?", "answer": "No", "category": 1,
+                "difficulty": 1}
+        response = self.client.post(
+            "/questions/batch",
+            data=json.dumps({"questions": [
+                dict(item, difficulty=True), dict(item, category=True)]}),
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(
+            [result["error"] for result in json.loads(response.data)["results"]],
+            ["difficulty must be an integer from 1 to 5", "unknown category"])
+
+    def test_conditional_get(self):
+        response = self.client.get("/questions?page=1")
+        etag = response.headers["ETag"]
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+        with QueryCounter() as queries:
+            response = self.client.get(
+                "/questions?page=1", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertFalse(
+            [sql for sql in queries.statements if "FROM questions" in sql])
+
+        data = {"question": "Who painted the Night Watch?",
+                "answer": "Rembrandt", "category": 2, "difficulty": 2}
+        self.client.post("/questions", json=data)
+        response = self.client.get(
+            "/questions?page=1", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        # writing questions leaves the categories' tag alone
+        response = self.client.get("/categories")
+        self.assertIn("max-age", response.headers["Cache-Control"])
+        response = self.client.get(
+            "/categories", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_categories_written_by_another_process(self):
+        response = self.client.get("/categories")
+        etag = response.headers["ETag"]
+        with self.app.app_context():
+            # what another worker's commit looks like to this one: the rows
+            # and the version change, but no session here saw the write
+            connection = db.session.connection()
+            connection.execute(
+                Category.__table__.insert().values(type="Music"))
+            bump(connection, "categories")
+            db.session.commit()
+        self.assertFalse(categories.stale)
+
+        response = self.client.get(
+            "/categories", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertIn("Music", json.loads(response.data)["categories"])
+
+    def test_first_version_bumps(self):
+        with self.app.app_context():
+            connection = db.session.connection()
+            bump(connection, "new")
+            bump(connection, "new")
+            self.assertEqual(current_versions(["new"]), {"new": 2})
+
+    def test_cors_preflight(self):
+        with QueryCounter() as queries:
+            response = self.client.options(
+                "/questions",
+                headers={"Origin": "http://localhost:3000",
+                         "Access-Control-Request-Method": "POST"})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.headers["Access-Control-Max-Age"], "86400")
+        self.assertIn("POST",
+                      response.headers["Access-Control-Allow-Methods"])
+        self.assertEqual(response.headers["Access-Control-Allow-Origin"],
+                         "http://localhost:3000")
+        self.assertEqual(
+            response.headers["Access-Control-Allow-Credentials"], "true")
+        self.assertEqual(queries.statements, [])
+
+    def test_cors_headers_set_once(self):
+        response = self.client.get(
+            "/categories", headers={"Origin": "http://localhost:3000"})
+        for name in ("Access-Control-Allow-Origin",
+                     "Access-Control-Allow-Headers",
+                     "Access-Control-Allow-Methods",
+                     "Access-Control-Allow-Credentials"):
+            self.assertEqual(len(response.headers.getlist(name)), 1)
+        # echoed, as flask_cors did, so credentialed requests are allowed
+        self.assertEqual(response.headers["Access-Control-Allow-Origin"],
+                         "http://localhost:3000")
+        self.assertEqual(
+            response.headers["Access-Control-Allow-Credentials"], "true")
+        self.assertIn("Origin", response.headers["Vary"])
+        response = self.client.get(
+            "/questions/1000000", headers={"Origin": "http://example.com"})
+        self.assertEqual(response.headers["Access-Control-Allow-Origin"],
+                         "http://example.com")
+        response = self.client.get("/categories")
+        self.assertNotIn("Access-Control-Allow-Origin", response.headers)
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
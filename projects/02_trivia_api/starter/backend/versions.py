@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, String, event, text
+
+from models import db, Question, Category
+
+"""
+DataVersion
+    a change counter per table, bumped in the same transaction as every
+    ORM insert, update or delete of its rows, so a response built from a
+    table can be tagged with the version it saw
+
+"""
+
+
+class DataVersion(db.Model):
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# one statement, so two first writes to a table cannot race
+# (Postgres and SQLite 3.24+ share this syntax)
+UPSERT = text(
+    "INSERT INTO data_versions (name, version) VALUES (:name, 1) "
+    "ON CONFLICT (name) DO UPDATE SET version = data_versions.version + 1"
+)
+
+
+def bump(connection, name):
+    connection.execute(UPSERT, name=name)
+
+
+def current_versions(names):
+    """{name: version} for names, 0 for a table never written to."""
+    rows = dict(
+        db.session.query(DataVersion.name, DataVersion.version)
+        .filter(DataVersion.name.in_(names))
+    )
+    return {name: rows.get(name, 0) for name in names}
+
+
+def etag(versions):
+    """A strong ETag for a response built from the tables in versions, as
+    returned by current_versions."""
+    return ".".join("{}-{}".format(name, version)
+                    for name, version in versions.items())
+
+
+def listen(model, name):
+    def changed(mapper, connection, target):
+        bump(connection, name)
+
+    for change in ("after_insert", "after_update", "after_delete"):
+        event.listen(model, change, changed)
+
+
+listen(Question, "questions")
+listen(Category, "categories")
@@ -0,0 +1,69 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import rsa
+from jose import jwk, jwt
+
+from src.auth import auth
+
+"""
+Signing keys, tokens and a JWKS endpoint for test_auth and bench_auth
+
+    Tokens are signed with a key made here and carry the claims the coffee
+    shop's auth0 checks, so neither needs an Auth0 account.
+"""
+
+
+def make_key(kid):
+    """A private key PEM and its public JWK."""
+    _, private = rsa.newkeys(1024)
+    pem = private.save_pkcs1().decode()
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    public.update(kid=kid, use="sig")
+    return pem, public
+
+
+def make_token(pem, kid, **claims):
+    """A token for the coffee shop API signed with pem, valid for an hour."""
+    payload = {
+        "iss": "https://" + auth.AUTH0_DOMAIN + "/",
+        "aud": auth.API_AUDIENCE,
+        "sub": "auth0|barista",
+        "exp": int(time.time()) + 3600,
+        "permissions": ["get:drinks-detail"],
+    }
+    payload.update(claims)
+    return jwt.encode(payload, pem, algorithm="RS256", headers={"kid": kid})
+
+
+class StubJWKSServer:
+    """Serves a JWKS document on localhost and counts the fetches."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.fetches = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.fetches += 1
+                body = json.dumps({"keys": stub.keys}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/.well-known/jwks.json".format(
+            self.server.server_port)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
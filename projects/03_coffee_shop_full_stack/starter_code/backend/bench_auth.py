@@ -0,0 +1,70 @@
+"""Time requires_auth with and without the verified-token cache.
+
+    python bench_auth.py --count 2000 --tokens 10
+
+Each request carries one of --tokens bearer tokens, as a handful of signed
+in users would send. The keys are served in process so only token
+verification is timed. The time spent in each stage of the check is
+printed after each run.
+"""
+import argparse
+import time
+
+from flask import Flask
+
+from auth_fixtures import make_key, make_token
+from src.auth import auth
+from src.auth.auth import (TOKEN_CACHE_SIZE, JWKSCache, TokenCache,
+                           requires_auth)
+
+
+def make_tokens(pem, count):
+    return [
+        make_token(pem, "bench", sub="auth0|user-{}".format(i),
+                   permissions=["get:drinks-detail", "post:drinks"])
+        for i in range(count)
+    ]
+
+
+def timed(app, tokens, count):
+    @requires_auth("get:drinks-detail")
+    def drinks_detail(payload):
+        return payload
+
+    start = time.perf_counter()
+    for i in range(count):
+        headers = {"Authorization": "Bearer " + tokens[i % len(tokens)]}
+        with app.test_request_context(headers=headers):
+            drinks_detail()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=10)
+    args = parser.parse_args()
+
+    pem, public = make_key("bench")
+    auth.auth0.jwks = JWKSCache(
+        "in-process", fetch=lambda url: {"keys": [public]}, background=False)
+    tokens = make_tokens(pem, args.tokens)
+    app = Flask(__name__)
+
+    print("{} requests, {} tokens".format(args.count, args.tokens))
+    baseline = None
+    for name, maxsize in (("uncached", 0), ("cached", TOKEN_CACHE_SIZE)):
+        auth.auth0.verified_tokens = TokenCache(maxsize)
+        auth.auth0.timings.reset()
+        elapsed = timed(app, tokens, args.count)
+        baseline = baseline or elapsed
+        print("{:<10} {:>10.1f}us/request {:>10.0f} requests/s  x{:.1f}".format(
+            name, elapsed / args.count * 10 ** 6, args.count / elapsed,
+            baseline / elapsed))
+        for stage, times in auth.auth0.timings.snapshot().items():
+            print("    {:<10} {:>8} x {:>8.1f}us".format(
+                stage, times["count"], times["mean_us"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Time /drinks served from the menu snapshot against rebuilding it per request.
+
+    python bench_menu.py --count 2000 --drinks 50
+
+The rebuilt run drops the snapshot before each request, which is what every
+request cost before the snapshot. Requests go through the Flask test client
+against an in-memory SQLite database.
+"""
+import argparse
+import os
+import time
+
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from sqlalchemy import event
+
+from src.api import app
+from src.database.models import Drink, db
+from src.menu import menu
+
+
+def seed(count):
+    for i in range(count):
+        db.session.add(Drink(title="drink {}".format(i), recipe=[
+            {"name": "espresso", "color": "brown", "parts": 1},
+            {"name": "milk", "color": "white", "parts": i % 4 + 1},
+        ]))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--drinks", type=int, default=50)
+    args = parser.parse_args()
+
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    with app.app_context():
+        seed(args.drinks)
+        event.listen(db.engine, "before_cursor_execute", count)
+        client = app.test_client()
+
+        print("{} requests, {} drinks".format(args.count, args.drinks))
+        baseline = None
+        for name, rebuild in (("rebuilt", True), ("snapshot", False)):
+            menu.invalidate()
+            statements[0] = 0
+            start = time.perf_counter()
+            for _ in range(args.count):
+                if rebuild:
+                    menu.invalidate()
+                client.get("/drinks")
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print("{:<10} {:>8.1f}us/request {:>8.0f} requests/s "
+                  "{:>6.2f} statements/request  x{:.1f}".format(
+                      name, elapsed / args.count * 10 ** 6, args.count / elapsed,
+                      statements[0] / args.count, baseline / elapsed))
+
+
+if __name__ == "__main__":
+    main()
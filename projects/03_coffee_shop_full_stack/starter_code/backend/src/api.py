@@ -2,7 +2,8 @@ from flask import Flask, request, jsonify, abort
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db_drop_and_create_all, setup_db, db, Drink
+from .menu import menu
 from .auth.auth import AuthError, requires_auth
 
 app = Flask(__name__)
@@ -15,23 +16,23 @@ db_drop_and_create_all()
 # ROUTES
 
 
+def menu_response(form):
+    body, etag = menu.get(form)
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
 @app.route("/drinks", methods=["GET"])
 def get_drinks():
-    drinks_res = Drink.query.all()
-    drinks = []
-    for drink in drinks_res:
-        drinks.append(drink.short())
-    return jsonify({"success": True, "drinks": drinks})
+    return menu_response("short")
 
 
 @app.route("/drinks-detail", methods=["GET"])
 @requires_auth(permission="get:drinks-detail")
 def get_drink_details(data):
-    drinks_res = Drink.query.all()
-    drinks = []
-    for drink in drinks_res:
-        drinks.append(drink.long())
-    return jsonify({"success": True, "drinks": drinks})
+    return menu_response("long")
 
 
 @app.route("/drinks", methods=["POST"])
@@ -40,7 +41,9 @@ def create_drinks(data):
     data = json.loads(request.data)
     title = data.get("title")
     recipe = data.get("recipe")
-    drink = Drink(title=title, recipe=json.dumps(recipe))
+    if not isinstance(recipe, (list, dict)):
+        abort(422)
+    drink = Drink(title=title, recipe=recipe)
     drink.insert()
     return jsonify({"success": True, "drinks": drink.long()})
 
@@ -58,6 +61,8 @@ def update_drinks(data, id):
     if title:
         drink.title = title
     if recipe:
+        if not isinstance(recipe, (list, dict)):
+            abort(422)
         drink.recipe = recipe
     drink.update()
     return jsonify({"success": True, "drinks": [drink.long()]})
@@ -68,6 +73,7 @@ def update_drinks(data, id):
 def delete_drink(data, drink_id):
     drink_id = request.view_args["drink_id"]
     Drink.query.filter_by(id=drink_id).delete()
+    db.session.commit()
     return jsonify({"success": True, "delete": drink_id})
 
 
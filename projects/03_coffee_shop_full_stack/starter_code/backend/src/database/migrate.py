@@ -0,0 +1,78 @@
+import json
+import sys
+
+from sqlalchemy import create_engine, inspect, text
+
+from .models import Drink, MenuVersion, database_path, short_recipe
+
+"""
+upgrade(connection)
+    moves drink.recipe from a VARCHAR of JSON text to a JSON column (JSONB
+    on Postgres) and fills in recipe_short
+
+    Rows written by the old update_drinks may hold a recipe that was
+    encoded more than once, or not at all; each is decoded until it is no
+    longer a JSON string. Running it on a table that is already converted
+    does nothing. It also creates the menu_version table if it is missing.
+    From the ./backend directory:
+
+        python -m src.database.migrate [database url]
+"""
+
+
+def decode_recipe(value):
+    while isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            break
+    return value
+
+
+def upgrade(connection):
+    MenuVersion.__table__.create(connection, checkfirst=True)
+    if not connection.dialect.has_table(connection, "drink"):
+        return
+    columns = {column["name"] for column in inspect(connection).get_columns("drink")}
+    if "recipe_short" in columns:
+        return
+    table = Drink.__table__
+
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(
+            "ALTER TABLE drink ALTER COLUMN recipe TYPE JSONB "
+            "USING to_jsonb(recipe)"
+        ))
+        connection.execute(text("ALTER TABLE drink ADD COLUMN recipe_short JSONB"))
+        rows = connection.execute(text("SELECT id, recipe FROM drink")).fetchall()
+        for id, recipe in rows:
+            recipe = decode_recipe(recipe)
+            connection.execute(
+                table.update()
+                .where(table.c.id == id)
+                .values(recipe=recipe, recipe_short=short_recipe(recipe))
+            )
+    else:
+        # SQLite cannot change a column's type, so the table is rebuilt
+        connection.execute(text("ALTER TABLE drink RENAME TO drink_old"))
+        table.create(connection)
+        rows = connection.execute(
+            text("SELECT id, title, recipe FROM drink_old")
+        ).fetchall()
+        if rows:
+            connection.execute(table.insert(), [
+                {
+                    "id": id,
+                    "title": title,
+                    "recipe": decode_recipe(recipe),
+                    "recipe_short": short_recipe(decode_recipe(recipe)),
+                }
+                for id, title, recipe in rows
+            ])
+        connection.execute(text("DROP TABLE drink_old"))
+
+
+if __name__ == "__main__":
+    engine = create_engine(sys.argv[1] if len(sys.argv) > 1 else database_path)
+    with engine.begin() as connection:
+        upgrade(connection)
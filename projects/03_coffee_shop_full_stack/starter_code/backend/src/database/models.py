@@ -1,11 +1,18 @@
 import os
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from pool import engine_options
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
+database_path = os.environ.get(
+    "DATABASE_URL",
+    "sqlite:///{}".format(os.path.join(project_dir, database_filename)),
+)
 
 db = SQLAlchemy()
 
@@ -15,9 +22,10 @@ setup_db(app)
 """
 
 
-def setup_db(app):
+def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
 
@@ -27,6 +35,23 @@ def db_drop_and_create_all():
     db.create_all()
 
 
+"""
+short_recipe(recipe)
+    the color and parts of each ingredient, all the public menu shows
+"""
+
+
+def short_recipe(recipe):
+    if isinstance(recipe, list):
+        return [short_recipe(ingredient) for ingredient in recipe]
+    if isinstance(recipe, dict):
+        return {"color": recipe.get("color"), "parts": recipe.get("parts")}
+    return None
+
+
+# JSONB on Postgres, JSON text on SQLite
+RecipeType = JSON().with_variant(JSONB(), "postgresql")
+
 """
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -38,9 +63,16 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients, stored as JSON
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe = Column(String(180), nullable=False)
+    recipe = Column(RecipeType, nullable=False)
+    # short_recipe(recipe), kept in step with recipe whenever it is set
+    recipe_short = Column(RecipeType)
+
+    @validates("recipe")
+    def set_recipe_short(self, key, recipe):
+        self.recipe_short = short_recipe(recipe)
+        return recipe
 
     """
     short()
@@ -48,9 +80,7 @@ class Drink(db.Model):
     """
 
     def short(self):
-        recipe = json.loads(self.recipe)
-        short_recipe = {"color": recipe.get("color"), "parts": recipe.get("parts")}
-        return {"id": self.id, "title": self.title, "recipe": short_recipe}
+        return {"id": self.id, "title": self.title, "recipe": self.recipe_short}
 
     """
     long()
@@ -58,7 +88,7 @@ class Drink(db.Model):
     """
 
     def long(self):
-        return {"id": self.id, "title": self.title, "recipe": json.loads(self.recipe)}
+        return {"id": self.id, "title": self.title, "recipe": self.recipe}
 
     def insert(self):
         db.session.add(self)
@@ -73,3 +103,17 @@ class Drink(db.Model):
 
     def __repr__(self):
         return json.dumps(self.short())
+
+
+"""
+MenuVersion
+    a single row counting commits that changed the drinks, so every
+    process can tell when its menu snapshot is out of date
+"""
+
+
+class MenuVersion(db.Model):
+    __tablename__ = "menu_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,128 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .database.models import Drink, MenuVersion, db
+
+CHECK_INTERVAL = float(os.environ.get("MENU_CHECK_INTERVAL", 1))
+
+"""
+MenuSnapshot
+    the /drinks and /drinks-detail response bodies, serialized once
+
+    Both bodies are built from one query the first time either is asked
+    for and kept, with an ETag from a hash of each, until a session that
+    wrote to drinks (including a bulk Query.delete) commits.
+
+    Each process keeps its own snapshot. Writes through the ORM also bump
+    menu_version in their transaction, and a snapshot older than that row
+    is dropped; the row is read at most once per check_interval seconds
+    (MENU_CHECK_INTERVAL, 1 by default), so that is how long another
+    worker's write can take to show. Between checks the menu costs no
+    database queries.
+"""
+
+
+class MenuSnapshot:
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.lock = threading.Lock()
+        self.views = None
+        self.version = None
+        self.generation = 0
+        self.builds = 0
+        self.check_interval = check_interval
+        self.checked = 0
+
+    @staticmethod
+    def current_version():
+        return db.session.query(MenuVersion.version).scalar() or 0
+
+    def build(self):
+        drinks = Drink.query.order_by(Drink.id).all()
+        views = {}
+        for form, serialize in (("short", Drink.short), ("long", Drink.long)):
+            body = json.dumps(
+                {"success": True, "drinks": [serialize(drink) for drink in drinks]},
+                separators=(",", ":"),
+            ).encode()
+            views[form] = (body, hashlib.sha256(body).hexdigest()[:32])
+        self.builds += 1
+        return views
+
+    def get(self, form):
+        """(body, etag) for the "short" or "long" form of the menu."""
+        now = time.monotonic()
+        if self.views is not None and now - self.checked >= self.check_interval:
+            self.checked = now
+            # another process committed a change to the drinks
+            if self.current_version() != self.version:
+                self.invalidate()
+        views = self.views
+        if views is None:
+            with self.lock:
+                views = self.views
+                if views is None:
+                    generation = self.generation
+                    # read first, so a racing write only makes it look older
+                    version = self.current_version()
+                    views = self.build()
+                    # a commit during the build may not be in it
+                    if generation == self.generation:
+                        self.views = views
+                        self.version = version
+                        self.checked = time.monotonic()
+        return views[form]
+
+    def invalidate(self):
+        self.generation += 1
+        self.views = None
+
+
+menu = MenuSnapshot()
+
+# one statement, so two first writes cannot race
+# (Postgres and SQLite 3.24+ share this syntax)
+BUMP = text(
+    "INSERT INTO menu_version (id, version) VALUES (1, 1) "
+    "ON CONFLICT (id) DO UPDATE SET version = menu_version.version + 1"
+)
+
+
+def menu_changed(session):
+    # once per transaction, in it
+    if not session.info.get("menu_changed"):
+        session.info["menu_changed"] = True
+        session.execute(BUMP)
+
+
+@event.listens_for(Session, "after_flush")
+def drinks_flushed(session, flush_context):
+    if any(
+        isinstance(instance, Drink)
+        for instance in itertools.chain(session.new, session.dirty, session.deleted)
+    ):
+        menu_changed(session)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def drinks_bulk_changed(context):
+    if context.mapper.class_ is Drink:
+        menu_changed(context.session)
+
+
+@event.listens_for(Session, "after_commit")
+def drinks_committed(session):
+    if session.info.pop("menu_changed", False):
+        menu.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def drinks_rolled_back(session):
+    session.info.pop("menu_changed", None)
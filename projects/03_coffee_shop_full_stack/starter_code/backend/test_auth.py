@@ -0,0 +1,187 @@
+import threading
+import time
+import unittest
+
+from flask import Flask, jsonify
+
+from auth_fixtures import StubJWKSServer, make_key, make_token
+from src.auth import auth
+from src.auth.auth import (AuthError, JWKSCache, TokenCache, requires_auth,
+                           verify_decode_jwt)
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route("/drinks-detail")
+    @requires_auth("get:drinks-detail")
+    def drinks_detail(payload):
+        return jsonify({"success": True, "sub": payload["sub"]})
+
+    @app.errorhandler(AuthError)
+    def auth_error(error):
+        return jsonify(error.error), error.status_code
+
+    return app
+
+
+class AuthTestCase(unittest.TestCase):
+    """Token verification against a local JWKS endpoint."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pem, cls.public = make_key("key-1")
+        cls.rotated_pem, cls.rotated_public = make_key("key-2")
+
+    def setUp(self):
+        self.server = StubJWKSServer([self.public])
+        self.jwks = auth.auth0.jwks
+        self.verified_tokens = auth.auth0.verified_tokens
+        auth.auth0.jwks = JWKSCache(self.server.url, background=False)
+        auth.auth0.verified_tokens = TokenCache()
+        auth.auth0.timings.reset()
+
+    def tearDown(self):
+        auth.auth0.jwks = self.jwks
+        auth.auth0.verified_tokens = self.verified_tokens
+        self.server.close()
+
+    def token(self, pem=None, kid="key-1", **claims):
+        return make_token(pem or self.pem, kid, **claims)
+
+    def test_keys_fetched_once(self):
+        for _ in range(3):
+            payload = verify_decode_jwt(self.token())
+        self.assertEqual(payload["sub"], "auth0|barista")
+        self.assertEqual(self.server.fetches, 1)
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        auth.auth0.jwks.refetch_interval = 0
+        verify_decode_jwt(self.token())
+        # the provider rotates its keys
+        self.server.keys = [self.public, self.rotated_public]
+        payload = verify_decode_jwt(
+            self.token(self.rotated_pem, kid="key-2"))
+        self.assertEqual(payload["sub"], "auth0|barista")
+        self.assertEqual(self.server.fetches, 2)
+
+        auth.auth0.jwks.refetch_interval = 60
+        for _ in range(3):
+            with self.assertRaises(AuthError):
+                verify_decode_jwt(self.token(kid="key-3"))
+        self.assertEqual(self.server.fetches, 2)
+
+    def test_expired_keys_are_refetched(self):
+        auth.auth0.jwks.ttl = 0
+        verify_decode_jwt(self.token())
+        verify_decode_jwt(self.token())
+        self.assertEqual(self.server.fetches, 2)
+
+    def test_first_fetch_failure_is_a_401(self):
+        fetches = []
+
+        def fetch(url):
+            fetches.append(url)
+            raise OSError("unreachable")
+
+        auth.auth0.jwks = JWKSCache(self.server.url, fetch=fetch,
+                                    refetch_interval=60)
+        for _ in range(3):
+            with self.assertRaises(AuthError) as error:
+                verify_decode_jwt(self.token())
+            self.assertEqual(error.exception.status_code, 401)
+        self.assertEqual(len(fetches), 1)
+
+        auth.auth0.jwks.refetch_interval = 0
+        auth.auth0.jwks.fetch = lambda url: {"keys": [self.public]}
+        self.assertEqual(verify_decode_jwt(self.token())["sub"],
+                         "auth0|barista")
+        self.assertIsNotNone(auth.auth0.jwks.thread)
+
+    def test_one_background_thread(self):
+        jwks = JWKSCache(self.server.url)
+        runs = []
+        jwks.run = lambda: runs.append(threading.current_thread())
+        threads = [threading.Thread(target=jwks.get, args=("key-1",))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        jwks.thread.join()
+        self.assertEqual(runs, [jwks.thread])
+
+    def test_background_refresh(self):
+        auth.auth0.jwks = JWKSCache(self.server.url, ttl=0.2, refetch_interval=0.5)
+        verify_decode_jwt(self.token())
+        time.sleep(0.5)
+        self.assertGreater(self.server.fetches, 1)
+        verify_decode_jwt(self.token())
+
+    def test_invalid_tokens(self):
+        with self.assertRaises(AuthError) as error:
+            verify_decode_jwt(self.token(exp=int(time.time()) - 10))
+        self.assertEqual(error.exception.error["code"], "token_expired")
+        with self.assertRaises(AuthError) as error:
+            verify_decode_jwt(self.token(aud="someone-else"))
+        self.assertEqual(error.exception.error["code"], "invalid_claims")
+        with self.assertRaises(AuthError):
+            verify_decode_jwt("not a token")
+
+    def test_verified_tokens_are_cached(self):
+        client = make_app().test_client()
+        verifications = []
+
+        def counting_verify(token):
+            verifications.append(token)
+            return verify_decode_jwt(token)
+
+        auth.auth0.verify_decode_jwt = counting_verify
+        try:
+            headers = {"Authorization": "Bearer " + self.token()}
+            for _ in range(3):
+                response = client.get("/drinks-detail", headers=headers)
+                self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(verifications), 1)
+
+            # a cached token is still checked for each route's permission
+            token = self.token(permissions=["get:drinks"])
+            headers = {"Authorization": "Bearer " + token}
+            for _ in range(2):
+                response = client.get("/drinks-detail", headers=headers)
+                self.assertEqual(response.status_code, 403)
+            self.assertEqual(len(verifications), 2)
+        finally:
+            del auth.auth0.verify_decode_jwt
+
+    def test_token_cache_expiry_and_size(self):
+        cache = TokenCache(maxsize=2)
+        now = int(time.time())
+        cache.add("expired", {"exp": now - 1, "permissions": []})
+        self.assertIsNone(cache.get("expired"))
+        for token in ("a", "b", "c"):
+            cache.add(token, {"exp": now + 60, "permissions": [token]})
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c")[1], frozenset(["c"]))
+
+        disabled = TokenCache(maxsize=0)
+        disabled.add("a", {"exp": now + 60, "permissions": []})
+        self.assertIsNone(disabled.get("a"))
+
+    def test_stage_timings(self):
+        client = make_app().test_client()
+        headers = {"Authorization": "Bearer " + self.token()}
+        for _ in range(3):
+            client.get("/drinks-detail", headers=headers)
+        client.get("/drinks-detail", headers={
+            "Authorization": "Bearer " + self.token(aud="someone-else")})
+        stages = auth.auth0.timings.snapshot()
+        self.assertEqual(
+            {stage: times["count"] for stage, times in stages.items()},
+            {"header": 4, "key": 2, "signature": 2, "claims": 2})
+        self.assertGreater(stages["signature"]["seconds"], 0)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
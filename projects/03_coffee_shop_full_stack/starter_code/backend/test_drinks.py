@@ -0,0 +1,192 @@
+import json
+import os
+import time
+import unittest
+
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from flask import Flask
+from sqlalchemy import event, text
+
+from src.api import app
+from src.auth.auth import TokenCache, auth0
+from src.database.migrate import upgrade
+from src.database.models import Drink, db, setup_db
+from src.menu import BUMP, menu
+
+
+class DrinkTestCase(unittest.TestCase):
+    """Drink recipes against an in-memory SQLite database."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        setup_db(self.app, "sqlite://")
+        self.context = self.app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_short_recipe_follows_recipe(self):
+        db.create_all()
+        recipe = [
+            {"name": "espresso", "color": "brown", "parts": 1},
+            {"name": "milk", "color": "white", "parts": 2},
+        ]
+        Drink(title="flat white", recipe=recipe).insert()
+        drink = Drink.query.one()
+        self.assertEqual(drink.long()["recipe"], recipe)
+        self.assertEqual(drink.short()["recipe"], [
+            {"color": "brown", "parts": 1},
+            {"color": "white", "parts": 2},
+        ])
+
+        drink.recipe = {"name": "water", "color": "blue", "parts": 1}
+        drink.update()
+        db.session.expire_all()
+        self.assertEqual(Drink.query.one().short()["recipe"],
+                         {"color": "blue", "parts": 1})
+
+    def test_upgrade_converts_text_recipes(self):
+        water = {"name": "Water", "color": "blue", "parts": 1}
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE drink (id INTEGER NOT NULL, title VARCHAR(80), "
+                "recipe VARCHAR(180) NOT NULL, PRIMARY KEY (id), UNIQUE (title))"
+            ))
+            connection.execute(
+                text("INSERT INTO drink VALUES (:id, :title, :recipe)"), [
+                    {"id": 1, "title": "water", "recipe": json.dumps(water)},
+                    # written twice over by the old update_drinks
+                    {"id": 2, "title": "twice",
+                     "recipe": json.dumps(json.dumps([water]))},
+                ])
+            upgrade(connection)
+            upgrade(connection)
+
+        drinks = {drink.id: drink for drink in Drink.query.all()}
+        self.assertEqual(drinks[1].recipe, water)
+        self.assertEqual(drinks[2].recipe, [water])
+        self.assertEqual(drinks[2].short()["recipe"],
+                         [{"color": "blue", "parts": 1}])
+        Drink(title="new", recipe=[water]).insert()
+        self.assertEqual(Drink.query.count(), 3)
+
+
+class MenuTestCase(unittest.TestCase):
+    """The menu snapshot behind /drinks and /drinks-detail."""
+
+    def setUp(self):
+        self.context = app.app_context()
+        self.context.push()
+        db.create_all()
+        for title, color in (("latte", "brown"), ("matcha", "green")):
+            Drink(title=title, recipe=[
+                {"name": title, "color": color, "parts": 1}]).insert()
+        menu.invalidate()
+        self.builds = menu.builds
+        self.client = app.test_client()
+        self.statements = 0
+        event.listen(db.engine, "before_cursor_execute", self.count)
+
+    def tearDown(self):
+        event.remove(db.engine, "before_cursor_execute", self.count)
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def count(self, *args):
+        self.statements += 1
+
+    def titles(self):
+        response = self.client.get("/drinks")
+        return [drink["title"] for drink in response.get_json()["drinks"]]
+
+    def test_menu_needs_no_queries_between_writes(self):
+        response = self.client.get("/drinks")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["drinks"][0], {
+            "id": 1, "title": "latte",
+            "recipe": [{"color": "brown", "parts": 1}],
+        })
+        etag = response.headers["ETag"]
+
+        self.statements = 0
+        for _ in range(20):
+            again = self.client.get("/drinks")
+            self.assertEqual(again.data, response.data)
+        self.assertEqual(self.statements, 0)
+        self.assertEqual(menu.builds - self.builds, 1)
+
+        response = self.client.get("/drinks", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_rebuild_menu(self):
+        self.assertEqual(self.titles(), ["latte", "matcha"])
+
+        Drink(title="mocha", recipe={"name": "mocha", "color": "brown",
+                                     "parts": 2}).insert()
+        self.assertEqual(self.titles(), ["latte", "matcha", "mocha"])
+
+        drink = Drink.query.filter_by(title="latte").one()
+        drink.title = "flat white"
+        drink.update()
+        self.assertEqual(self.titles(), ["flat white", "matcha", "mocha"])
+
+        Drink.query.filter_by(title="matcha").delete()
+        db.session.commit()
+        self.assertEqual(self.titles(), ["flat white", "mocha"])
+
+        builds = menu.builds
+        Drink.query.filter_by(title="mocha").delete()
+        db.session.rollback()
+        self.assertEqual(self.titles(), ["flat white", "mocha"])
+        self.assertEqual(menu.builds, builds)
+
+    def test_writes_from_another_process(self):
+        self.assertEqual(self.titles(), ["latte", "matcha"])
+        # what another worker's commit looks like to this one: the rows
+        # and menu_version change, but no session here saw the write
+        with db.engine.begin() as connection:
+            connection.execute(Drink.__table__.insert().values(
+                title="mocha", recipe=[], recipe_short=[]))
+            connection.execute(BUMP)
+
+        self.statements = 0
+        self.assertEqual(self.titles(), ["latte", "matcha"])
+        self.assertEqual(self.statements, 0)
+
+        check_interval = menu.check_interval
+        menu.check_interval = 0
+        try:
+            self.assertEqual(self.titles(), ["latte", "matcha", "mocha"])
+            builds = menu.builds
+            self.titles()
+            self.assertEqual(menu.builds, builds)
+        finally:
+            menu.check_interval = check_interval
+
+    def test_drinks_detail(self):
+        verified_tokens = auth0.verified_tokens
+        auth0.verified_tokens = TokenCache()
+        auth0.verify_decode_jwt = lambda token: {
+            "exp": time.time() + 60, "permissions": ["get:drinks-detail"]}
+        try:
+            headers = {"Authorization": "Bearer token"}
+            response = self.client.get("/drinks-detail", headers=headers)
+            self.assertEqual(response.get_json()["drinks"][1]["recipe"], [
+                {"name": "matcha", "color": "green", "parts": 1}])
+            self.assertNotEqual(
+                response.headers["ETag"],
+                self.client.get("/drinks").headers["ETag"])
+        finally:
+            del auth0.verify_decode_jwt
+            auth0.verified_tokens = verified_tokens
+        self.assertEqual(menu.builds - self.builds, 1)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
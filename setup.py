@@ -0,0 +1,9 @@
+from setuptools import setup
+
+# pool.py and jwtauth.py are shared by the projects; each one's
+# requirements.txt installs them from here (pip install -e)
+setup(
+    name="fsnd-shared",
+    version="0.1.0",
+    py_modules=["jwtauth", "pool"],
+)